@@ -1,12 +1,15 @@
 import streamlit as st
-import joblib
-import numpy as np
-import pandas as pd
-from utils.preprocessor import preprocess_input
+from utils import warmup
+from utils.metrics import instrumentation
 
 # Page config
 st.set_page_config(page_title="GHG Emission Predictor", page_icon="🌍", layout="wide")
 
+# ---------- Load Model and Scaler ----------
+# numpy/pandas/sklearn and the model are loaded on a background thread so the
+# page renders straight away; Predict is enabled once they are ready.
+warmup.start()
+
 # ---------- Custom CSS Styling ----------
 st.markdown("""
     <style>
@@ -90,16 +93,12 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# ---------- Load Model and Scaler ----------
-model = joblib.load('models/LR_model.pkl')
-scaler = joblib.load('models/scaler.pkl')
-
 # ---------- Header ----------
 st.markdown("<div class='main-title'>🌱 GHG Emission Predictor</div>", unsafe_allow_html=True)
 st.markdown("<div class='subtitle'>Estimate Supply Chain Emission Factors with DQ Metrics</div>", unsafe_allow_html=True)
 
 # ---------- Tabs ----------
-tab1, tab2 = st.tabs(["📥 Predict Emissions", "📘 About"])
+tab1, tab2, tab3, tab4 = st.tabs(["📥 Predict Emissions", "📤 Bulk Upload", "📊 Analytics", "📘 About"])
 
 # ---------- Tab 1: Prediction Form ----------
 with tab1:
@@ -128,9 +127,25 @@ with tab1:
         dq_tech = st.slider("⚙️ DQ Technological Correlation", 0.0, 1.0, 0.5)
         dq_data = st.slider("📚 DQ Data Collection", 0.0, 1.0, 0.5)
 
-        submit = st.form_submit_button("🔍 Predict Emissions")
+        submit = st.form_submit_button("🔍 Predict Emissions", disabled=not warmup.is_ready())
+
+    if warmup.error() is not None:
+        st.error(f"❌ Could not load the model: {warmup.error()}")
+        if st.button("🔁 Retry loading"):
+            warmup.start(retry=True)
+            st.rerun()
+    elif not warmup.is_ready():
+        @st.fragment(run_every=0.5)
+        def wait_for_model():
+            if warmup.is_ready() or warmup.error() is not None:
+                st.rerun()
+            st.info("⏳ Loading model, Predict will be enabled in a moment...")
+
+        wait_for_model()
 
     if submit:
+        from utils.prediction_cache import predict_interval_cached, predict_row_cached
+
         with st.spinner("🔄 Processing your input..."):
             input_data = {
                 'Substance': substance,
@@ -145,21 +160,201 @@ with tab1:
                 'Source': source,
             }
 
-            input_df = preprocess_input(pd.DataFrame([input_data]))
-            input_scaled = scaler.transform(input_df)
-            prediction = model.predict(input_scaled)
+            with instrumentation.request():
+                # The feature schema fills a NumPy row directly, no DataFrame per submit.
+                # For a forest, one cached entry holds the prediction (the trees' mean)
+                # and their spread; other models have no interval.
+                interval = predict_interval_cached(input_data, (0.05, 0.95))
+                prediction = interval['mean'] if interval is not None else predict_row_cached(input_data)
 
             st.success("✅ Prediction Complete!")
             st.markdown(f"""
                 ### 🌍 Predicted Emission Factor:
                 **🔢 {prediction[0]:.4f}**
             """)
+            if interval is not None:
+                low, high = (interval['quantiles'][q][0] for q in (0.05, 0.95))
+                st.markdown(f"📏 90% of trees predict between **{low:.4f}** and **{high:.4f}** "
+                            f"(std {interval['std'][0]:.4f})")
             st.balloons()
 
+    # ---------- What-if Sweep ----------
+    with st.expander("🎛️ What-if sensitivity sweep"):
+        st.markdown("Varies the selected inputs around the values last submitted above and "
+                    "scores every variant in one batch.")
+        sweep_inputs = {
+            "DQ Reliability": 'DQ ReliabilityScore of Factors without Margins',
+            "DQ Temporal Correlation": 'DQ TemporalCorrelation of Factors without Margins',
+            "DQ Geographical Correlation": 'DQ GeographicalCorrelation of Factors without Margins',
+            "DQ Technological Correlation": 'DQ TechnologicalCorrelation of Factors without Margins',
+            "DQ Data Collection": 'DQ DataCollection of Factors without Margins',
+            "Supply Chain Factor without Margins": 'Supply Chain Emission Factors without Margins',
+            "Margins": 'Margins of Supply Chain Emission Factors',
+        }
+        selected = st.multiselect("🎚️ Inputs to vary", list(sweep_inputs), default=["DQ Reliability", "Margins"])
+        col1, col2 = st.columns(2)
+        with col1:
+            method = st.radio("🧮 Sampling", ["grid", "lhs"], horizontal=True,
+                              format_func=lambda m: "Grid" if m == "grid" else "Latin hypercube")
+        with col2:
+            n_variants = st.select_slider("🔢 Variants", [1_000, 5_000, 10_000, 20_000, 50_000], value=10_000)
+        run_sweep = st.button("🚀 Run Sweep", disabled=not selected or not warmup.is_ready())
+
+        if run_sweep:
+            from utils.sensitivity import sweep
+
+            base = {
+                'Substance': substance,
+                'Unit': unit,
+                'Supply Chain Emission Factors without Margins': supply_wo_margin,
+                'Margins of Supply Chain Emission Factors': margin,
+                'DQ ReliabilityScore of Factors without Margins': dq_reliability,
+                'DQ TemporalCorrelation of Factors without Margins': dq_temporal,
+                'DQ GeographicalCorrelation of Factors without Margins': dq_geo,
+                'DQ TechnologicalCorrelation of Factors without Margins': dq_tech,
+                'DQ DataCollection of Factors without Margins': dq_data,
+                'Source': source,
+            }
+            with st.spinner("🔄 Scoring variants..."):
+                result = sweep(base, [sweep_inputs[label] for label in selected], n_variants, method)
+            st.session_state['sweep'] = (selected, result)
+
+        if 'sweep' in st.session_state:
+            import altair as alt
+            from utils.sensitivity import PREDICTION_COLUMN, heatmap, partial_dependence
+
+            selected, result = st.session_state['sweep']
+            st.caption(f"{len(result):,} variants scored")
+            st.markdown("#### 📈 Partial dependence")
+            chart_columns = st.columns(min(len(selected), 3))
+            for i, label in enumerate(selected):
+                with chart_columns[i % len(chart_columns)]:
+                    curve = partial_dependence(result, sweep_inputs[label]).rename(
+                        columns={sweep_inputs[label]: label})
+                    st.line_chart(curve, x=label, y=PREDICTION_COLUMN, height=220)
+
+            if len(selected) >= 2:
+                st.markdown("#### 🗺️ Interaction")
+                x_label, y_label = selected[:2]
+                cells = heatmap(result, sweep_inputs[x_label], sweep_inputs[y_label]).rename(
+                    columns={sweep_inputs[x_label]: x_label, sweep_inputs[y_label]: y_label})
+                st.altair_chart(alt.Chart(cells).mark_rect().encode(
+                    x=alt.X(f'{x_label}:O', axis=alt.Axis(format='.3f')),
+                    y=alt.Y(f'{y_label}:O', axis=alt.Axis(format='.3f'), sort='descending'),
+                    color=alt.Color(f'{PREDICTION_COLUMN}:Q', scale=alt.Scale(scheme='greens')),
+                    tooltip=[x_label, y_label, PREDICTION_COLUMN],
+                ), use_container_width=True)
+
     st.markdown("</div>", unsafe_allow_html=True)
 
-# ---------- Tab 2: About ----------
+# ---------- Tab 2: Bulk Upload ----------
 with tab2:
+    st.markdown("<div class='section'>", unsafe_allow_html=True)
+    st.header("📤 Score a File")
+    st.markdown("Upload a CSV or Parquet file with the same ten columns as the form "
+                "(Substance, Unit, the two supply chain factors, the five DQ metrics and Source).")
+
+    uploaded = st.file_uploader("📄 Input file", type=["csv", "parquet"])
+    output_format = st.radio("💾 Output format", ["Parquet", "CSV (gzip)"], horizontal=True)
+    run_bulk = st.button("⚙️ Score File", disabled=uploaded is None or not warmup.is_ready())
+
+    if run_bulk:
+        import os
+        import tempfile
+        from utils.batch_score import bulk_slots, file_format, score_stream
+
+        suffix = '.parquet' if output_format == "Parquet" else '.csv.gz'
+        # Scored chunks go straight to a file, only one chunk is in memory at a time. The
+        # file lives in a per-session temp directory, which is deleted when the session's
+        # state is dropped (or at exit), so abandoned sessions leave nothing behind.
+        if 'bulk_dir' not in st.session_state:
+            st.session_state['bulk_dir'] = tempfile.TemporaryDirectory(prefix='ghg-bulk-')
+        previous = st.session_state.pop('bulk_output', None)
+        if previous and os.path.exists(previous[0]):
+            os.remove(previous[0])
+        output_path = os.path.join(st.session_state['bulk_dir'].name, 'scored' + suffix)
+
+        bar = st.progress(0.0, text="⏳ Waiting for another bulk job to finish...")
+
+        def show_progress(rows, fraction):
+            bar.progress(min(fraction or 0.0, 1.0), text=f"🔄 Scored {rows:,} rows")
+
+        # One bulk job at a time per server, so other sessions stay responsive
+        with bulk_slots:
+            try:
+                rows = score_stream(uploaded, output_path, file_format(uploaded.name), progress=show_progress)
+                bar.progress(1.0, text=f"✅ Scored {rows:,} rows")
+                name = os.path.splitext(uploaded.name)[0] + '_scored' + suffix
+                st.session_state['bulk_output'] = (output_path, name, rows)
+            except Exception as e:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+                bar.empty()
+                st.error(f"❌ {e}")
+
+    if 'bulk_output' in st.session_state:
+        output_path, name, rows = st.session_state['bulk_output']
+        # download_button reads the whole file into memory each time it is drawn, so
+        # it is only drawn on the rerun the user asks for, not on every rerun
+        if st.button(f"📦 Prepare download of {rows:,} predictions", key="bulk_prepare"):
+            with open(output_path, 'rb') as f:
+                st.download_button(f"⬇️ Download {rows:,} predictions", f, name, on_click="ignore")
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# ---------- Tab 3: Analytics ----------
+with tab3:
+    st.markdown("<div class='section'>", unsafe_allow_html=True)
+    st.header("📊 Top Emitters")
+
+    if warmup.cube_is_ready():
+        from utils.cube import STATS, get_cube
+
+        # Loaded by the warmup thread; rankings come precomputed, no raw rows are scanned
+        cube = get_cube()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            analytics_year = st.selectbox("📅 Year", ["All"] + cube.years, key="analytics_year")
+        with col2:
+            analytics_substance = st.selectbox("🌫️ Substance", ["All", 'carbon dioxide', 'methane', 'nitrous oxide', 'other GHGs'], key="analytics_substance")
+        with col3:
+            analytics_source = st.selectbox("🏭 Source", ["All", 'Commodity', 'Industry'], key="analytics_source")
+        with col4:
+            stat = st.selectbox("📐 Statistic", STATS)
+        top_n = st.slider("🔝 Number of emitters", 5, 50, 10)
+
+        analytics_year = None if analytics_year == "All" else analytics_year
+        analytics_substance = None if analytics_substance == "All" else analytics_substance
+        analytics_source = None if analytics_source == "All" else analytics_source
+
+        top = cube.top(top_n, stat, analytics_year, analytics_substance, analytics_source)
+        st.bar_chart(top, x='Name', y=stat, horizontal=True)
+        st.dataframe(top, hide_index=True, use_container_width=True)
+
+        if analytics_year is not None and analytics_year - 1 in cube.years:
+            st.markdown(f"### 📈 Largest changes since {analytics_year - 1}")
+            col1, col2 = st.columns(2)
+            with col1:
+                st.dataframe(cube.yoy(analytics_year, top_n, stat, analytics_substance, analytics_source),
+                             hide_index=True, use_container_width=True)
+            with col2:
+                st.dataframe(cube.yoy(analytics_year, top_n, stat, analytics_substance, analytics_source,
+                                      ascending=True), hide_index=True, use_container_width=True)
+    elif warmup.cube_error() is not None:
+        st.error(f"❌ Could not load the analytics data: {warmup.cube_error()}")
+    else:
+        @st.fragment(run_every=1.0)
+        def wait_for_cube():
+            if warmup.cube_is_ready() or warmup.cube_error() is not None:
+                st.rerun()
+            st.info("⏳ Building the analytics tables, this takes a few seconds on a fresh deploy...")
+
+        wait_for_cube()
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# ---------- Tab 4: About ----------
+with tab4:
     st.markdown("<div class='section'>", unsafe_allow_html=True)
     st.header("📘 About This App")
 
@@ -179,7 +374,22 @@ with tab2:
     - [GitHub Profile](https://github.com/ismail11-star)
 
     ### ✅ Model Status:
-    - ML Model & Scaler loaded successfully.
     """)
+    st.markdown("- ML Model & Scaler loaded successfully." if warmup.is_ready() else "- ML Model & Scaler are loading...")
+
+    # Only shown when the server runs with GHG_METRICS=1
+    if instrumentation.enabled:
+        with st.expander("⏱️ Prediction latency by stage"):
+            snapshot = instrumentation.snapshot()
+            st.table([
+                {'stage': name, **{key: stats[key] for key in ('count', 'mean', 'window_count', 'p50', 'p90', 'p99')}}
+                for name, stats in snapshot['stages_seconds'].items()
+            ])
+            st.caption("Count and mean since start; percentiles over the last five minutes.")
+            st.download_button("⬇️ Metrics (JSON)", instrumentation.to_json(indent=2), "metrics.json", "application/json")
+            st.download_button("⬇️ Metrics (Prometheus)", instrumentation.prometheus(), "metrics.prom", "text/plain")
+            if snapshot['profiles']:
+                st.download_button("⬇️ Slowest request profiles", instrumentation.profile_text(), "profiles.txt",
+                                   "text/plain")
 
     st.markdown("</div>", unsafe_allow_html=True)
@@ -1,7 +1,7 @@
 import streamlit as st
-import joblib
 import numpy as np
 import pandas as pd
+from utils.model_registry import get_model, get_scaler
 from utils.preprocessor import preprocess_input
 
 # Page configuration
@@ -65,8 +65,8 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Load model and scaler
-model = joblib.load('models/LR_model.pkl')
-scaler = joblib.load('models/scaler.pkl')
+model = get_model()
+scaler = get_scaler()
 
 # Sidebar content
 with st.sidebar:
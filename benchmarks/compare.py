@@ -0,0 +1,52 @@
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, threshold=0.10, metric='median'):
+    # Rows for every benchmark in both files; `regressed` when current is slower
+    # than baseline by more than `threshold` (a fraction)
+    rows = []
+    for name, base in baseline['results'].items():
+        if name not in current['results']:
+            continue
+        before, after = base[metric], current['results'][name][metric]
+        change = (after - before) / before if before else 0.0
+        rows.append({
+            'name': name,
+            'baseline': before,
+            'current': after,
+            'change': change,
+            'regressed': change > threshold,
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown, e.g. 0.1 for 10%%')
+    parser.add_argument('--metric', default='median', choices=['median', 'min', 'max'])
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold, args.metric)
+    for row in rows:
+        flag = 'REGRESSION' if row['regressed'] else ''
+        print(f"{row['name']:<32} {row['baseline'] * 1000:12.3f} ms {row['current'] * 1000:12.3f} ms "
+              f"{row['change']:+8.1%} {flag}")
+
+    regressions = [row['name'] for row in rows if row['regressed']]
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}')
+        sys.exit(1)
+    print('No regressions')
+
+
+if __name__ == '__main__':
+    main()
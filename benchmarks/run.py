@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from importlib import metadata
+
+import pandas as pd
+
+from utils.data_loader import EXCEL_FILE, load_emission_data, read_workbook
+from utils.ingest import ingest_workbook
+from utils.model_registry import MODEL_PATH, SCALER_PATH, get_model, get_scaler
+from utils.preprocessor import preprocess_input
+
+BATCH_SIZES = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+PACKAGES = ('numpy', 'pandas', 'scikit-learn', 'joblib', 'pyarrow', 'openpyxl', 'streamlit')
+
+
+def measure(fn, repeat=5, budget=10.0):
+    # Run fn up to `repeat` times, stopping early once `budget` seconds are spent
+    times = []
+    total_start = time.perf_counter()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+        if time.perf_counter() - total_start > budget:
+            break
+    return {
+        'median': statistics.median(times),
+        'min': min(times),
+        'max': max(times),
+        'repeats': len(times),
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    versions = {}
+    for name in PACKAGES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'packages': versions,
+        'git_commit': commit or None,
+        'model_size_bytes': os.path.getsize(MODEL_PATH) if os.path.exists(MODEL_PATH) else None,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def sample_records(n, seed=0):
+    # Raw form-style rows drawn from the workbook, as the apps would receive them
+    scaler = get_scaler()
+    df = load_emission_data()[list(scaler.feature_names_in_)]
+    return df.sample(n, replace=True, random_state=seed).to_dict('records')
+
+
+def bench_prediction_path(sizes, repeat, budget):
+    model = get_model()
+    scaler = get_scaler()
+    results = {}
+    for n in sizes:
+        records = sample_records(n)
+        raw_df = pd.DataFrame(records)
+        input_df = preprocess_input(raw_df)
+        input_scaled = scaler.transform(input_df)
+
+        stages = {
+            'dataframe': lambda: pd.DataFrame(records),
+            'preprocess_input': lambda: preprocess_input(raw_df),
+            'scaler_transform': lambda: scaler.transform(input_df),
+            'model_predict': lambda: model.predict(input_scaled),
+            'end_to_end': lambda: model.predict(scaler.transform(preprocess_input(pd.DataFrame(records)))),
+        }
+        for stage, fn in stages.items():
+            result = measure(fn, repeat, budget)
+            result['rows'] = n
+            result['rows_per_sec'] = n / result['median'] if result['median'] else None
+            results[f'{stage}[{n}]'] = result
+            print(f"{stage:>16} n={n:<8} median {result['median'] * 1000:10.3f} ms")
+    return results
+
+
+def bench_cold_start(repeat):
+    # Fresh interpreter each time: imports plus unpickling the scaler and model
+    code = ('import numpy, pandas, joblib; '
+            f'joblib.load({SCALER_PATH!r}); joblib.load({MODEL_PATH!r})')
+    result = measure(lambda: subprocess.run([sys.executable, '-c', code], check=True), repeat, budget=120.0)
+    print(f"      cold_start median {result['median']:.3f} s")
+    return {'cold_start': result}
+
+
+def bench_ingestion(repeat):
+    results = {
+        'ingest_read_excel': measure(lambda: read_workbook(EXCEL_FILE), repeat, budget=60.0),
+        'ingest_parallel': measure(lambda: ingest_workbook(EXCEL_FILE), repeat, budget=60.0),
+        'ingest_cached': measure(lambda: load_emission_data(EXCEL_FILE), max(repeat, 5), budget=10.0),
+    }
+    for name, result in results.items():
+        print(f"{name:>22} median {result['median']:.3f} s")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the GHG emission prediction path.')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(BATCH_SIZES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=10.0, help='max seconds per stage and batch size')
+    parser.add_argument('--skip-cold-start', action='store_true')
+    parser.add_argument('--skip-ingestion', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = bench_prediction_path(args.sizes, args.repeat, args.budget)
+    if not args.skip_cold_start:
+        results.update(bench_cold_start(min(args.repeat, 3)))
+    if not args.skip_ingestion:
+        results.update(bench_ingestion(min(args.repeat, 3)))
+
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
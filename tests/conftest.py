@@ -0,0 +1,21 @@
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from utils.data_loader import load_emission_data
+from utils.model_registry import SCALER_PATH, get_scaler
+from utils.preprocessor import FEATURE_COLUMNS, preprocess_input
+
+TARGET = 'Supply Chain Emission Factors with Margins'
+
+
+@pytest.fixture(scope='session')
+def data():
+    # A sample of the training rows, and a small forest fitted on them the way
+    # train.py fits the real one (encoded, then scaled by the shipped scaler)
+    df = load_emission_data().sample(3000, random_state=0).reset_index(drop=True)
+    scaler = get_scaler(SCALER_PATH)
+    encoded = preprocess_input(df[FEATURE_COLUMNS])
+    X = scaler.transform(encoded)
+    y = df[TARGET].to_numpy()
+    model = RandomForestRegressor(n_estimators=20, random_state=0, n_jobs=1).fit(X, y)
+    return {'df': df, 'scaler': scaler, 'encoded': encoded, 'X': X, 'y': y, 'model': model}
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from utils.forest import CompiledForest, load_compact, save_compact
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_float64_compact_file_matches_sklearn(data, tmp_path, mmap):
+    path = tmp_path / 'forest.ghgf'
+    save_compact(CompiledForest.from_estimator(data['model']), path, precision='float64')
+    expected = data['model'].predict(data['X'])
+    loaded = load_compact(path, mmap=mmap)
+    np.testing.assert_array_equal(loaded.predict(data['X']), expected)
+    assert loaded._trees is None  # stayed on the shared arrays
+    # Opting in rebuilds sklearn trees from the file's arrays for large batches
+    rebuilt = load_compact(path, mmap=mmap, native_rebuild=True)
+    np.testing.assert_array_equal(rebuilt.predict(data['X']), expected)
+    assert rebuilt._trees is not None
+
+
+def test_float32_compact_file_keeps_every_split(data, tmp_path):
+    # Thresholds are rounded down to float32, so every row reaches the same leaves
+    path = tmp_path / 'forest.ghgf'
+    forest = CompiledForest.from_estimator(data['model'])
+    save_compact(forest, path, precision='float32')
+    loaded = load_compact(path)
+    leaves = forest.apply(data['X']) - forest.roots
+    np.testing.assert_array_equal(loaded.apply(data['X']) - loaded.roots, leaves)
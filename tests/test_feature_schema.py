@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.feature_schema import FeatureSchema
+from utils.preprocessor import FEATURE_COLUMNS, preprocess_input
+
+
+def test_feature_schema_row_matches_dataframe_path(data):
+    schema = FeatureSchema.from_scaler(data['scaler'])
+    records = data['df'][FEATURE_COLUMNS].head(200).to_dict('records')
+    expected = data['scaler'].transform(preprocess_input(pd.DataFrame(records, columns=FEATURE_COLUMNS)))
+    rows = np.vstack([schema.row(record).copy() for record in records])
+    np.testing.assert_array_equal(rows, expected)
+
+
+def test_feature_schema_rejects_unknown_labels(data):
+    schema = FeatureSchema.from_scaler(data['scaler'])
+    record = dict(data['df'][FEATURE_COLUMNS].iloc[0], Substance='ozone')
+    with pytest.raises(ValueError, match='Unknown Substance'):
+        schema.row(record)
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+
+from utils.forest import CompiledForest
+
+# Numbers of rows on both sides of CompiledForest's switch to sklearn's traversal
+BATCH_SIZES = (1, 7, 255, 256, 3000)
+
+
+@pytest.mark.parametrize('rows', BATCH_SIZES)
+def test_compiled_forest_matches_sklearn(data, rows):
+    X, model = data['X'][:rows], data['model']
+    forest = CompiledForest.from_estimator(model)
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+    # The NumPy traversal alone, without the large-batch sklearn path
+    forest.native_min_rows = np.inf
+    np.testing.assert_array_equal(forest.predict(X), model.predict(X))
@@ -0,0 +1,18 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+from utils.fused import FusedPredictor
+
+
+def test_fused_forest_matches_two_stage_pipeline(data):
+    fused = FusedPredictor.from_pipeline(data['model'], data['scaler'])
+    expected = data['model'].predict(data['scaler'].transform(data['encoded']))
+    np.testing.assert_array_equal(fused.predict(data['encoded']), expected)
+
+
+def test_fused_linear_matches_two_stage_pipeline(data):
+    # Folding the scaler into the coefficients reorders the arithmetic, so only close
+    model = LinearRegression().fit(data['X'], data['y'])
+    fused = FusedPredictor.from_pipeline(model, data['scaler'])
+    expected = model.predict(data['scaler'].transform(data['encoded']))
+    np.testing.assert_allclose(fused.predict(data['encoded']), expected, rtol=1e-7, atol=1e-9)
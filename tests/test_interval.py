@@ -0,0 +1,37 @@
+import joblib
+import numpy as np
+
+from utils.forest import CompiledForest, compiled_forest
+from utils.prediction_cache import PredictionCache, predict_interval_cached, predict_row_cached
+from utils.preprocessor import FEATURE_COLUMNS
+
+
+def test_compiled_forest_interval_mean_matches_predict(data):
+    forest = compiled_forest(data['model'])
+    interval = forest.predict_interval(data['X'])
+    np.testing.assert_array_equal(interval['mean'], data['model'].predict(data['X']))
+
+
+def test_cached_interval_is_one_entry_and_its_mean_is_the_prediction(data, tmp_path, monkeypatch):
+    path = str(tmp_path / 'forest.pkl')
+    joblib.dump(data['model'], path)
+    record = dict(data['df'][FEATURE_COLUMNS].iloc[0])
+    cache = PredictionCache()
+
+    interval = predict_interval_cached(record, model_path=path, cache=cache)
+    expected = predict_row_cached(record, model_path=path, cache=PredictionCache())
+    np.testing.assert_array_equal(interval['mean'], expected)
+    assert interval['std'][0] > 0
+    assert interval['quantiles'][0.05][0] <= interval['mean'][0] <= interval['quantiles'][0.95][0]
+
+    # A repeated submit is served from the cache, without walking the trees again
+    def no_walk(*args, **kwargs):
+        raise AssertionError('forest traversed on a cache hit')
+
+    monkeypatch.setattr(CompiledForest, 'predict_interval', no_walk)
+    again = predict_interval_cached(record, model_path=path, cache=cache)
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['size'] == 1
+    for key in ('mean', 'std'):
+        np.testing.assert_array_equal(again[key], interval[key])
+    np.testing.assert_array_equal(again['quantiles'][0.95], interval['quantiles'][0.95])
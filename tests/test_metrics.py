@@ -0,0 +1,56 @@
+from utils.metrics import Histogram, Instrumentation
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_quantiles_follow_the_window_and_buckets_stay_cumulative():
+    clock = Clock()
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0), window=60.0, slots=6, clock=clock)
+    for _ in range(1000):
+        histogram.observe(0.005)
+    assert histogram.quantile(0.99) == 0.01
+
+    # An hour later a spike: the rolling p99 moves, the cumulative one barely does
+    clock.now += 3600
+    for _ in range(5):
+        histogram.observe(0.5)
+    assert histogram.quantile(0.99) == 1.0
+    assert histogram.quantile(0.99, recent=False) == 0.01
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 1005
+    assert snapshot['window_count'] == 5
+    assert snapshot['buckets'] == {'0.01': 1000, '0.1': 0, '1.0': 5, '+Inf': 0}
+
+    # Older than the window: expired from the quantiles
+    clock.now += 61
+    assert histogram.quantile(0.5) is None
+    assert histogram.snapshot()['window_count'] == 0
+
+
+def test_window_keeps_recent_intervals():
+    clock = Clock()
+    histogram = Histogram(buckets=(1.0, 2.0), window=60.0, slots=6, clock=clock)
+    histogram.observe(0.5)
+    clock.now += 30
+    histogram.observe(1.5)
+    assert histogram.recent_counts() == [1, 1, 0]
+    clock.now += 30
+    assert histogram.recent_counts() == [0, 1, 0]
+
+
+def test_prometheus_buckets_are_cumulative():
+    inst = Instrumentation(enabled=True, buckets=(0.1, 1.0))
+    histogram = inst.stage_histogram('predict')
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+    text = inst.prometheus()
+    assert 'ghg_stage_seconds_bucket{stage="predict",le="0.1"} 1' in text
+    assert 'ghg_stage_seconds_bucket{stage="predict",le="1.0"} 2' in text
+    assert 'ghg_stage_seconds_bucket{stage="predict",le="+Inf"} 3' in text
+    assert 'ghg_stage_seconds_count{stage="predict"} 3' in text
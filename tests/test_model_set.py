@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import model_set as model_set_module
+from utils.model_set import ModelSet
+
+
+class Failing:
+    def predict(self, X):
+        raise RuntimeError('primary down')
+
+
+class Doubling:
+    def predict(self, X):
+        return X[:, 0] * 2.0
+
+
+@pytest.fixture
+def stub_models(monkeypatch):
+    # Models are looked up by "path"; here the path is the stub itself
+    monkeypatch.setattr(model_set_module, 'get_model', lambda model: model)
+    monkeypatch.setattr(ModelSet, 'transform', lambda self, input_df: input_df.to_numpy(dtype=float))
+
+
+def drain(model_set, name):
+    # The worker runs done callbacks before its next task, so this waits for them
+    model_set._executors[name].submit(lambda: None).result()
+
+
+def test_failed_primary_releases_shadow_slots(stub_models):
+    model_set = ModelSet({'primary': Failing(), 'shadow': Doubling()}, max_pending=4)
+    df = pd.DataFrame({'x': [1.0, 2.0, 3.0]})
+    try:
+        for _ in range(6):
+            with pytest.raises(RuntimeError):
+                model_set.predict_all(df)
+            drain(model_set, 'shadow')
+        shadow = model_set._stats['shadow']
+        assert shadow.pending == 0
+        assert shadow.skipped == 0
+
+        model_set.models['primary'] = Doubling()
+        for _ in range(3):
+            results = model_set.predict_all(df)
+            drain(model_set, 'shadow')
+        np.testing.assert_array_equal(results['shadow'], results['primary'])
+        stats = model_set.stats()['models']['shadow']
+        assert shadow.pending == 0
+        assert stats['rows'] == 9
+        assert stats['max_abs_diff'] == 0.0
+        assert stats['latency_seconds']['count'] == 9
+    finally:
+        model_set.close(wait=True)
+
+
+def test_failing_shadow_is_left_out(stub_models):
+    model_set = ModelSet({'primary': Doubling(), 'shadow': Failing()})
+    df = pd.DataFrame({'x': [1.0, 2.0]})
+    try:
+        results = model_set.predict_all(df)
+        drain(model_set, 'shadow')
+        assert list(results) == ['primary']
+        np.testing.assert_array_equal(results['primary'], [2.0, 4.0])
+        assert model_set._stats['shadow'].errors == 1
+        assert model_set._stats['shadow'].pending == 0
+    finally:
+        model_set.close(wait=True)
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from utils.prediction_cache import PredictionCache
+
+
+class CountingModel:
+    # Sum of each row; records how many rows every call predicted
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, rows):
+        rows = np.asarray(rows, dtype=np.float64)
+        self.calls.append(len(rows))
+        return rows.sum(axis=1)
+
+
+def test_repeated_rows_are_predicted_once():
+    cache, model = PredictionCache(), CountingModel()
+    X = np.array([[1.0, 2.0], [3.0, 4.0], [1.0, 2.0]])
+    np.testing.assert_array_equal(cache.predict(X, model), [3.0, 7.0, 3.0])
+    np.testing.assert_array_equal(cache.predict(X[[1]], model), [7.0])
+    assert model.calls == [2]
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 3
+
+
+def test_keys_are_rounded():
+    cache, model = PredictionCache(decimals=6), CountingModel()
+    cache.predict(pd.DataFrame([[1.0, 2.0]]), model)
+    np.testing.assert_array_equal(cache.predict(pd.DataFrame([[1.0 + 1e-9, 2.0]]), model), [3.0])
+    assert model.calls == [1]
+
+
+def test_new_version_invalidates_entries():
+    cache, model = PredictionCache(), CountingModel()
+    X = np.array([[1.0, 2.0]])
+    cache.predict(X, model, version=1)
+    cache.predict(X, model, version=2)
+    assert model.calls == [1, 1]
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache, model = PredictionCache(maxsize=2, ttl=10.0), CountingModel()
+    now = [100.0]
+    monkeypatch.setattr('utils.prediction_cache.time.monotonic', lambda: now[0])
+    cache.predict(np.array([[1.0], [2.0]]), model)
+    cache.predict(np.array([[1.0]]), model)  # [1.0] is now the most recent
+    cache.predict(np.array([[3.0]]), model)  # evicts [2.0]
+    assert cache.stats()['evictions'] == 1
+    cache.predict(np.array([[1.0], [2.0]]), model)
+    assert model.calls == [2, 1, 1]
+
+    now[0] += 11
+    cache.predict(np.array([[1.0]]), model)
+    assert cache.stats()['expirations'] == 1
+    assert model.calls == [2, 1, 1, 1]
+
+
+def test_vector_entries():
+    cache = PredictionCache()
+
+    def spread(rows):
+        rows = np.asarray(rows)
+        return np.column_stack([rows.min(axis=1), rows.max(axis=1)])
+
+    X = np.array([[1.0, 5.0], [2.0, 3.0], [1.0, 5.0]])
+    expected = [[1.0, 5.0], [2.0, 3.0], [1.0, 5.0]]
+    np.testing.assert_array_equal(cache.predict(X, spread), expected)
+    np.testing.assert_array_equal(cache.predict(X, spread), expected)
+    assert cache.stats()['hits'] == 3
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.preprocessor import SUBSTANCE_MAP, CategoricalEncoder, encoder
+
+LABELS = ['methane', 'carbon dioxide', 'other GHGs', 'methane']
+EXPECTED = [SUBSTANCE_MAP[label] for label in LABELS]
+
+
+@pytest.mark.parametrize('dtype', [object, 'category', 'string[pyarrow]'])
+def test_encodes_every_column_layout(dtype):
+    values = pd.Series(LABELS, dtype=dtype)
+    np.testing.assert_array_equal(encoder.encode_column('Substance', values), EXPECTED)
+
+
+def test_encodes_through_a_non_identity_map():
+    custom = CategoricalEncoder({'Substance': {'methane': 7, 'carbon dioxide': 3, 'other GHGs': 5}})
+    for dtype in (object, 'category', 'string[pyarrow]'):
+        values = pd.Series(LABELS, dtype=dtype)
+        np.testing.assert_array_equal(custom.encode_column('Substance', values), [7, 3, 5, 7])
+
+
+@pytest.mark.parametrize('dtype', [object, 'category', 'string[pyarrow]'])
+def test_unknown_label_raises_with_its_name(dtype):
+    values = pd.Series(['methane', 'ozone'], dtype=dtype)
+    with pytest.raises(ValueError, match=r"Unknown Substance labels: \['ozone'\]"):
+        encoder.encode_column('Substance', values)
+
+
+@pytest.mark.parametrize('dtype', [object, 'category', 'string[pyarrow]'])
+def test_missing_label_raises(dtype):
+    values = pd.Series(['methane', None], dtype=dtype)
+    with pytest.raises(ValueError, match='Unknown Substance labels'):
+        encoder.encode_column('Substance', values)
+
+
+def test_unused_unknown_category_is_ignored():
+    values = pd.Categorical(['methane', 'nitrous oxide'], categories=['ozone', 'methane', 'nitrous oxide'])
+    np.testing.assert_array_equal(encoder.encode_column('Substance', values), [1, 2])
+
+
+def test_transform_leaves_the_input_frame_untouched():
+    df = pd.DataFrame({'Substance': ['methane'], 'Unit': ['kg/2018 USD, purchaser price'],
+                       'Source': ['Industry'], 'Margins of Supply Chain Emission Factors': [0.5]})
+    out = encoder.transform(df)
+    assert df['Substance'].tolist() == ['methane']
+    assert out[['Substance', 'Unit', 'Source']].iloc[0].tolist() == [1, 0, 1]
+    assert out['Margins of Supply Chain Emission Factors'].tolist() == [0.5]
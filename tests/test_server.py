@@ -0,0 +1,53 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from utils.server import MicroBatcher
+
+
+def make_predict(calls):
+    # Doubles each row's only value; a row of None makes the whole call fail
+    def predict(rows):
+        calls.append(len(rows))
+        if any(row[0] is None for row in rows):
+            raise ValueError('bad row')
+        return np.array([row[0] * 2.0 for row in rows])
+    return predict
+
+
+async def run_requests(batcher, requests):
+    batcher.start()
+    try:
+        return await asyncio.gather(*(batcher.predict(rows) for rows in requests), return_exceptions=True)
+    finally:
+        await batcher.stop()
+
+
+def test_requests_are_coalesced_into_one_call():
+    calls = []
+    batcher = MicroBatcher(make_predict(calls), max_batch_size=256, max_wait_ms=50)
+    results = asyncio.run(run_requests(batcher, [[[1.0]], [[2.0], [3.0]], [[4.0]]]))
+    assert results == [[2.0], [4.0, 6.0], [8.0]]
+    assert calls == [4]
+
+
+def test_failing_request_does_not_fail_its_batch():
+    calls = []
+    batcher = MicroBatcher(make_predict(calls), max_batch_size=256, max_wait_ms=50)
+    results = asyncio.run(run_requests(batcher, [[[1.0]], [[None]], [[3.0]]]))
+    assert results[0] == [2.0]
+    assert isinstance(results[1], ValueError)
+    assert results[2] == [6.0]
+    # One batched call, then each request retried on its own
+    assert calls == [3, 1, 1, 1]
+
+
+@pytest.mark.parametrize('max_batch_size', [1, 2])
+def test_batches_respect_the_size_limit(max_batch_size):
+    calls = []
+    batcher = MicroBatcher(make_predict(calls), max_batch_size=max_batch_size, max_wait_ms=50)
+    results = asyncio.run(run_requests(batcher, [[[float(i)]] for i in range(5)]))
+    assert results == [[2.0 * i] for i in range(5)]
+    assert sum(calls) == 5
+    assert max(calls) <= max_batch_size
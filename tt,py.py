@@ -1,7 +1,7 @@
 import streamlit as st
-import joblib
 import numpy as np
 import pandas as pd
+from utils.model_registry import get_model, get_scaler
 from utils.preprocessor import preprocess_input
 
 # Page config
@@ -91,8 +91,8 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ---------- Load Model and Scaler ----------
-model = joblib.load('models/LR_model.pkl')
-scaler = joblib.load('models/scaler.pkl')
+model = get_model()
+scaler = get_scaler()
 
 # ---------- Header ----------
 st.markdown("<div class='main-title'>🌱 GHG Emission Predictor</div>", unsafe_allow_html=True)
@@ -0,0 +1,165 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from utils.metrics import SIZE_BUCKETS, Histogram
+from utils.model_registry import MODEL_PATH, SCALER_PATH, get_model, get_scaler
+
+
+def _load(model_path, scaler_path):
+    # Process pool initializer: each worker loads the artifacts once
+    get_scaler(scaler_path)
+    get_model(model_path)
+
+
+def _predict(rows, model_path, scaler_path):
+    from utils.server import predict_records
+    return predict_records(rows, model_path, scaler_path)
+
+
+class _Lane:
+    def __init__(self, name, executor, max_pending):
+        self.name = name
+        self.executor = executor
+        self.max_pending = max_pending
+        self.slots = asyncio.Semaphore(max_pending)
+        self.in_flight = 0
+        self.latency = Histogram()
+        self.rows = Histogram(SIZE_BUCKETS)
+        self.counters = {'completed': 0, 'failed': 0, 'rejected': 0, 'timeouts': 0, 'cancelled': 0}
+
+    def stats(self):
+        return {
+            'in_flight': self.in_flight,
+            'max_pending': self.max_pending,
+            **self.counters,
+            'latency_seconds': self.latency.snapshot(),
+            'rows': self.rows.snapshot(),
+        }
+
+
+class AsyncPredictor:
+    # `await predictor.predict(rows)` runs encode -> scale -> predict in a thread or
+    # process pool. Requests of `bulk_rows` rows or more use a separate bulk lane
+    # with its own workers, so a burst of large batches cannot hold up small
+    # interactive ones. Each lane admits at most `max_pending` requests; past that,
+    # callers wait for a slot or get asyncio.QueueFull with `wait=False`.
+    # Create it inside the running event loop (it owns asyncio semaphores).
+    def __init__(self, executor='thread', workers=2, bulk_workers=1, max_pending=64,
+                 bulk_max_pending=4, bulk_rows=1000, model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.bulk_rows = bulk_rows
+        self._lanes = {
+            'interactive': _Lane('interactive', self._make_executor(executor, workers), max_pending),
+            'bulk': _Lane('bulk', self._make_executor(executor, bulk_workers), bulk_max_pending),
+        }
+
+    def _make_executor(self, kind, workers):
+        if kind == 'thread':
+            _load(self.model_path, self.scaler_path)
+            return ThreadPoolExecutor(workers)
+        if kind == 'process':
+            return ProcessPoolExecutor(workers, initializer=_load, initargs=(self.model_path, self.scaler_path))
+        raise ValueError(f'Unknown executor {kind!r}, expected thread or process')
+
+    async def predict(self, rows, timeout=None, lane=None, wait=True):
+        # `timeout` covers waiting for a slot and the prediction itself. On timeout or
+        # cancellation a request that has not started is dropped from the pool; one
+        # already running finishes in the background and keeps its slot until then.
+        lane = self._lanes[lane or ('bulk' if len(rows) >= self.bulk_rows else 'interactive')]
+        if not wait and lane.slots.locked():
+            lane.counters['rejected'] += 1
+            raise asyncio.QueueFull(f'{lane.name} lane is full ({lane.max_pending} pending)')
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(timeout):
+                await lane.slots.acquire()
+                lane.in_flight += 1
+                try:
+                    future = lane.executor.submit(_predict, rows, self.model_path, self.scaler_path)
+                except BaseException:
+                    self._done(lane)
+                    raise
+                future.add_done_callback(lambda _: self._release(loop, lane))
+                predictions = await asyncio.wrap_future(future)
+        except TimeoutError:
+            lane.counters['timeouts'] += 1
+            raise
+        except asyncio.CancelledError:
+            lane.counters['cancelled'] += 1
+            raise
+        except Exception:
+            lane.counters['failed'] += 1
+            raise
+        lane.counters['completed'] += 1
+        lane.latency.observe(time.perf_counter() - start)
+        lane.rows.observe(len(rows))
+        return predictions
+
+    def _release(self, loop, lane):
+        # Called from the worker thread (or the pool's management thread)
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._done, lane)
+
+    @staticmethod
+    def _done(lane):
+        lane.in_flight -= 1
+        lane.slots.release()
+
+    def stats(self):
+        return {name: lane.stats() for name, lane in self._lanes.items()}
+
+    def close(self, wait=True):
+        for lane in self._lanes.values():
+            lane.executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close(wait=False)
+
+
+async def _demo(args):
+    # A burst of bulk batches alongside a stream of single-row requests
+    from utils.data_loader import load_emission_data
+
+    scaler = get_scaler(args.scaler)
+    records = load_emission_data()[list(scaler.feature_names_in_)].to_dict('records')
+    bulk = (records * (args.bulk_size // len(records) + 1))[:args.bulk_size]
+
+    async with AsyncPredictor(args.executor, args.workers, args.bulk_workers,
+                              bulk_rows=args.bulk_rows, model_path=args.model, scaler_path=args.scaler) as predictor:
+        bulk_tasks = [asyncio.create_task(predictor.predict(bulk)) for _ in range(args.bulk_requests)]
+        for i in range(args.interactive_requests):
+            await predictor.predict(records[i:i + 1], timeout=args.timeout)
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*bulk_tasks)
+        for name, lane in predictor.stats().items():
+            latency = lane['latency_seconds']
+            print(f"{name:<12} completed={lane['completed']:<4} mean={latency['mean']:.4f}s p99<={latency['p99']}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Interactive latency under concurrent bulk load with AsyncPredictor.')
+    parser.add_argument('--executor', default='thread', choices=['thread', 'process'])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--bulk-workers', type=int, default=1)
+    parser.add_argument('--bulk-rows', type=int, default=1000)
+    parser.add_argument('--bulk-size', type=int, default=50_000)
+    parser.add_argument('--bulk-requests', type=int, default=4)
+    parser.add_argument('--interactive-requests', type=int, default=50)
+    parser.add_argument('--timeout', type=float, default=5.0)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    asyncio.run(_demo(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    # Run the module's own main so pool tasks pickle as utils.async_predictor._predict
+    from utils.async_predictor import main
+    main()
@@ -0,0 +1,167 @@
+import argparse
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.model_registry import MODEL_PATH, SCALER_PATH, get_model, get_scaler
+from utils.preprocessor import CATEGORY_MAPS, preprocess_input
+
+PREDICTION_COLUMN = 'Predicted Emission Factor'
+# Rows per chunk for in-app uploads; with one job at a time this caps the memory
+# a bulk upload can take on a shared Streamlit server regardless of file size
+BULK_CHUNKSIZE = 50_000
+bulk_slots = threading.BoundedSemaphore(int(os.environ.get('GHG_BULK_JOBS', 1)))
+
+# Set per worker process by _init_worker, so each process unpickles the model once
+_model = None
+_scaler = None
+
+
+def _init_worker(model_path, scaler_path):
+    global _model, _scaler
+    _model = get_model(model_path)
+    _scaler = get_scaler(scaler_path)
+
+
+def file_format(path):
+    # .csv.gz is CSV; pandas picks up the compression from the name
+    name = path.lower().removesuffix('.gz')
+    ext = os.path.splitext(name)[1]
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    if ext == '.csv':
+        return 'csv'
+    raise ValueError(f'Unsupported file type {ext!r}, expected .csv, .csv.gz or .parquet')
+
+
+def iter_chunks(source, chunksize, fmt=None):
+    # `source` is a path, or a file object (e.g. a Streamlit upload) when `fmt` is given.
+    # Category columns are read dictionary-encoded so the encoder only hashes the labels
+    if (fmt or file_format(source)) == 'csv':
+        dtype = {column: 'category' for column in CATEGORY_MAPS}
+        yield from pd.read_csv(source, chunksize=chunksize, dtype=dtype)
+    else:
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas(strings_to_categorical=True)
+
+
+def total_rows(source, fmt=None):
+    # Known up front for Parquet (footer metadata); CSV would need a full pass
+    if (fmt or file_format(source)) == 'parquet':
+        return pq.ParquetFile(source).metadata.num_rows
+    return None
+
+
+def score_chunk(df):
+    features = list(_scaler.feature_names_in_)
+    missing = [column for column in features if column not in df.columns]
+    if missing:
+        raise ValueError(f'Input is missing columns: {missing}')
+    input_scaled = _scaler.transform(preprocess_input(df[features]))
+    out = df.copy(deep=False)
+    out[PREDICTION_COLUMN] = _model.predict(input_scaled)
+    return out
+
+
+class ChunkWriter:
+    def __init__(self, path):
+        self.path = path
+        self.format = file_format(path)
+        self._writer = None
+        self._header = True
+
+    def write(self, df):
+        if self.format == 'csv':
+            df.to_csv(self.path, mode='w' if self._header else 'a', header=self._header, index=False)
+            self._header = False
+        else:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_file(input_path, output_path, chunksize=100_000, workers=1,
+               model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    start = time.perf_counter()
+    rows = 0
+    writer = ChunkWriter(output_path)
+    try:
+        if workers <= 1:
+            _init_worker(model_path, scaler_path)
+            for chunk in iter_chunks(input_path, chunksize):
+                writer.write(score_chunk(chunk))
+                rows += len(chunk)
+        else:
+            # At most two chunks per worker are in flight, which bounds memory
+            # regardless of file size; results are written back in input order.
+            with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                     initargs=(model_path, scaler_path)) as pool:
+                pending = deque()
+                for chunk in iter_chunks(input_path, chunksize):
+                    pending.append(pool.submit(score_chunk, chunk))
+                    if len(pending) >= 2 * workers:
+                        scored = pending.popleft().result()
+                        writer.write(scored)
+                        rows += len(scored)
+                while pending:
+                    scored = pending.popleft().result()
+                    writer.write(scored)
+                    rows += len(scored)
+    finally:
+        writer.close()
+    return rows, time.perf_counter() - start
+
+
+def score_stream(source, output_path, fmt=None, chunksize=BULK_CHUNKSIZE, progress=None,
+                 model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    # In-process scoring of a path or upload, one chunk at a time, for the app.
+    # `progress(rows, fraction)` is called after each chunk; fraction may be None.
+    _init_worker(model_path, scaler_path)
+    fmt = fmt or file_format(source)
+    total = total_rows(source, fmt)
+    size = getattr(source, 'size', None)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    rows = 0
+    writer = ChunkWriter(output_path)
+    try:
+        for chunk in iter_chunks(source, chunksize, fmt):
+            writer.write(score_chunk(chunk))
+            rows += len(chunk)
+            if progress is not None:
+                # CSV has no row count up front, so use how far into the upload we are
+                fraction = rows / total if total else source.tell() / size if size else None
+                progress(rows, fraction)
+    finally:
+        writer.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a CSV/Parquet file with the GHG emission model.')
+    parser.add_argument('input', help='CSV or Parquet file with the ten model input columns')
+    parser.add_argument('output', help='CSV or Parquet file to write predictions to')
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    args = parser.parse_args(argv)
+
+    rows, elapsed = score_file(args.input, args.output, args.chunksize, args.workers,
+                               args.model, args.scaler)
+    print(f'Scored {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import itertools
+import os
+import threading
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from utils.data_loader import CACHE_DIR, EXCEL_FILE, build_cache, file_hash, load_emission_data
+
+TARGET = 'Supply Chain Emission Factors with Margins'
+DIMENSIONS = ('Year', 'Substance', 'Source')
+STATS = ('mean', 'sum', 'max')
+
+
+def cube_path(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(excel_file))[0]
+    return os.path.join(cache_dir, f'cube-{stem}-{file_hash(excel_file)[:16]}.arrow')
+
+
+def aggregate(df):
+    # Finest cube level: one row per (Name, Year, Substance, Source). sum/count/max
+    # can be merged, so new sheets are folded in without touching the raw rows.
+    return (df.groupby(['Name', *DIMENSIONS], observed=True)[TARGET]
+              .agg(['sum', 'count', 'max'])
+              .reset_index())
+
+
+class AggregateCube:
+    # Every combination of Year/Substance/Source, each one also rolled up to
+    # "all" (None), maps to a per-name table and to rankings pre-sorted by each
+    # statistic, so a top-N or year-over-year query is a dict lookup plus a slice.
+    def __init__(self, base):
+        self.base = base.reset_index(drop=True)
+        self._tables = {}
+        self._rankings = {}
+        self._deltas = {}
+        self._refresh(self.base['Year'].unique())
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(aggregate(df))
+
+    @property
+    def years(self):
+        return sorted(self.base['Year'].unique().tolist())
+
+    def _refresh(self, years):
+        # Rebuild the tables for `years` plus the all-years rollups
+        years = set(int(year) for year in years)
+        affected = self.base[self.base['Year'].isin(years)]
+        for size in range(len(DIMENSIONS) + 1):
+            for dims in itertools.combinations(DIMENSIONS, size):
+                rows = affected if 'Year' in dims else self.base
+                rolled = (rows.groupby(['Name', *dims], observed=True)
+                              .agg(sum=('sum', 'sum'), count=('count', 'sum'), max=('max', 'max')))
+                rolled['mean'] = rolled['sum'] / rolled['count']
+                groups = rolled.groupby(level=list(dims) if len(dims) > 1 else dims[0]) if dims else [((), rolled)]
+                for values, table in groups:
+                    values = values if isinstance(values, tuple) else (values,)
+                    key = tuple(dict(zip(dims, values)).get(dim) for dim in DIMENSIONS)
+                    table = table.droplevel(list(dims)) if dims else table
+                    self._tables[key] = table
+                    for stat in STATS:
+                        self._rankings[key + (stat,)] = table[stat].sort_values(ascending=False)
+
+        # Year-over-year deltas for the refreshed years and the years after them
+        for key in list(self._tables):
+            year = key[0]
+            if year is None or not ({year, year - 1} & years):
+                continue
+            previous = self._tables.get((year - 1,) + key[1:])
+            if previous is None:
+                continue
+            for stat in STATS:
+                delta = (self._tables[key][stat] - previous[stat]).dropna()
+                self._deltas[key + (stat,)] = delta.sort_values(ascending=False)
+
+    def update(self, df):
+        # Fold in freshly ingested sheets. Any (Year, Source) already in the cube is
+        # replaced rather than double counted, so re-ingesting a year is safe.
+        new = aggregate(df)
+        replaced = self.base.set_index(['Year', 'Source']).index.isin(new.set_index(['Year', 'Source']).index)
+        self.base = pd.concat([self.base[~replaced], new], ignore_index=True)
+        self._refresh(new['Year'].unique())
+        return self
+
+    def top(self, n=10, stat='mean', year=None, substance=None, source=None, ascending=False):
+        ranking = self._rankings.get((year, substance, source, stat))
+        if ranking is None:
+            return pd.DataFrame(columns=['Name', stat])
+        ranked = ranking.iloc[::-1] if ascending else ranking
+        return ranked.iloc[:n].rename(stat).reset_index()
+
+    def value(self, name, stat='mean', year=None, substance=None, source=None):
+        table = self._tables.get((year, substance, source))
+        return None if table is None or name not in table.index else table.at[name, stat]
+
+    def yoy(self, year, n=10, stat='mean', substance=None, source=None, ascending=False):
+        # Largest changes from `year - 1` to `year` (ascending=True for the largest drops)
+        deltas = self._deltas.get((year, substance, source, stat))
+        if deltas is None:
+            return pd.DataFrame(columns=['Name', 'delta'])
+        ranked = deltas.iloc[::-1] if ascending else deltas
+        return ranked.iloc[:n].rename('delta').reset_index()
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        feather.write_feather(self.base, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        return cls(feather.read_table(path, memory_map=True).to_pandas())
+
+
+def build_cube(df, excel_file=EXCEL_FILE, cache_dir=CACHE_DIR):
+    # Called from data_loader.build_cache, so the cube is refreshed with the data cache
+    path = cube_path(excel_file, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    cube = AggregateCube.from_frame(df)
+    cube.save(path)
+    for name in os.listdir(cache_dir):
+        if name.startswith('cube-') and name.endswith('.arrow') and name != os.path.basename(path):
+            os.remove(os.path.join(cache_dir, name))
+    return cube
+
+
+def load_cube(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR):
+    path = cube_path(excel_file, cache_dir)
+    if os.path.exists(path):
+        return AggregateCube.load(path)
+    return build_cube(load_emission_data(excel_file, cache_dir), excel_file, cache_dir)
+
+
+_cube = None
+_cube_lock = threading.Lock()
+
+
+def get_cube():
+    # Shared by all Streamlit sessions, like the model registry
+    global _cube
+    with _cube_lock:
+        if _cube is None:
+            _cube = load_cube()
+        return _cube
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Emitter rankings from the precomputed aggregate cube.')
+    parser.add_argument('--stat', default='mean', choices=STATS)
+    parser.add_argument('--year', type=int)
+    parser.add_argument('--substance')
+    parser.add_argument('--source', choices=['Commodity', 'Industry'])
+    parser.add_argument('-n', type=int, default=10)
+    parser.add_argument('--add-years', type=int, nargs='*', default=[],
+                        help='ingest these years from the workbook and fold them into the cube')
+    parser.add_argument('--rebuild', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        build_cache()
+    cube = load_cube()
+    if args.add_years:
+        from utils.ingest import ingest_workbook
+
+        cube.update(ingest_workbook(EXCEL_FILE, years=args.add_years))
+        cube.save(cube_path())
+
+    print(cube.top(args.n, args.stat, args.year, args.substance, args.source).to_string(index=False))
+    if args.year is not None:
+        print(f'\nLargest increases since {args.year - 1}:')
+        print(cube.yoy(args.year, args.n, args.stat, args.substance, args.source).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
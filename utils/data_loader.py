@@ -0,0 +1,98 @@
+import hashlib
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+EXCEL_FILE = 'SupplyChainEmissionFactorsforUSIndustriesCommodities.xlsx'
+YEARS = range(2010, 2017)
+SOURCES = ('Commodity', 'Industry')
+CACHE_DIR = '.cache'
+
+
+def detail_sheets(years=YEARS):
+    # (sheet name, year, source) for every *_Detail_Commodity / *_Detail_Industry sheet
+    return [(f'{year}_Detail_{source}', year, source) for year in years for source in SOURCES]
+
+
+def normalize_sheet(df, year, source):
+    # Same cleanup the notebook applies to each sheet before concatenating
+    df.columns = df.columns.str.strip()
+    df = df.rename(columns={f'{source} Code': 'Code', f'{source} Name': 'Name'})
+    df['Source'] = source
+    df['Year'] = year
+    return df
+
+
+def read_sheet(excel_file, year, source):
+    df = pd.read_excel(excel_file, sheet_name=f'{year}_Detail_{source}')
+    return normalize_sheet(df, year, source)
+
+
+def read_workbook(excel_file=EXCEL_FILE, years=YEARS):
+    frames = [read_sheet(excel_file, year, source) for _, year, source in detail_sheets(years)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(excel_file))[0]
+    return os.path.join(cache_dir, f'{stem}-{file_hash(excel_file)[:16]}.arrow')
+
+
+def build_cache(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR, max_workers=None):
+    from utils.cube import build_cube
+    from utils.ingest import ingest_workbook
+
+    path = cache_path(excel_file, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    df = ingest_workbook(excel_file, max_workers=max_workers)
+    # Code can be mixed int/str across sheets, keep it as text for Arrow
+    df['Code'] = df['Code'].astype(str)
+    # Uncompressed Arrow IPC so later loads can be memory-mapped
+    tmp_path = path + '.tmp'
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    # Drop caches built from older versions of the workbook
+    prefix = os.path.basename(path).rsplit('-', 1)[0] + '-'
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name.endswith('.arrow') and name != os.path.basename(path):
+            os.remove(os.path.join(cache_dir, name))
+    # Rankings for the analytics tab, materialised from the same ingest
+    build_cube(df, excel_file, cache_dir)
+    return path
+
+
+def load_table(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR, rebuild=False):
+    path = cache_path(excel_file, cache_dir)
+    if rebuild or not os.path.exists(path):
+        build_cache(excel_file, cache_dir)
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def load_emission_data(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR, rebuild=False):
+    # Combined Detail sheets, as built by the notebook's `for year in years:` loop
+    return load_table(excel_file, cache_dir, rebuild).to_pandas()
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    if '--rebuild' in sys.argv or not os.path.exists(cache_path()):
+        start = time.perf_counter()
+        path = build_cache()
+        print(f'Built {path} in {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    df = load_emission_data()
+    print(f'Loaded {len(df)} rows from cache in {(time.perf_counter() - start) * 1000:.1f}ms')
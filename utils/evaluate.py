@@ -0,0 +1,215 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+import psutil
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import KFold
+
+from utils.data_loader import CACHE_DIR, EXCEL_FILE, file_hash
+from utils.model_registry import MODEL_PATH
+from utils.train import FEATURE_VERSION, load_feature_matrix
+
+
+def tuned_model(model_path=MODEL_PATH):
+    # Unfitted copy of the served forest, so the report covers the parameters that
+    # are actually in production rather than a hand-copied set
+    model = joblib.load(model_path) if os.path.isfile(model_path) else None
+    if not hasattr(model, 'get_params'):
+        raise ValueError(f'{model_path} is not a pickled sklearn estimator; pass --tuned-model with the '
+                         'pickle the served model was exported from')
+    return clone(model).set_params(n_jobs=1)
+
+
+# The notebook's comparison_df models; single-threaded so folds can run in parallel
+CANDIDATES = {
+    'rf_default': lambda: RandomForestRegressor(random_state=42, n_jobs=1),
+    'linear': LinearRegression,
+    'rf_tuned': tuned_model,
+}
+RESULTS_PATH = os.path.join(CACHE_DIR, 'evaluation.json')
+
+
+def fold_indices(n_rows, cv=5, seed=42, cache_dir=CACHE_DIR, data_key=''):
+    # KFold splits saved per dataset, so every run and candidate uses the same folds
+    path = os.path.join(cache_dir, f'folds-{data_key}-n{n_rows}-k{cv}-s{seed}.npz')
+    if os.path.exists(path):
+        with np.load(path) as saved:
+            return [(saved[f'train{i}'], saved[f'test{i}']) for i in range(cv)]
+    folds = list(KFold(cv, shuffle=True, random_state=seed).split(np.empty((n_rows, 1))))
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(path, **{f'{kind}{i}': idx for i, fold in enumerate(folds) for kind, idx in zip(('train', 'test'), fold)})
+    return folds
+
+
+def candidate_key(name, model, cv, data_key):
+    # Same name, parameters, folds and data -> same key, so the result can be reused
+    params = json.dumps(model.get_params(), sort_keys=True, default=str)
+    digest = hashlib.sha256(f'{name}|{type(model).__name__}|{params}|{cv}|{data_key}'.encode()).hexdigest()
+    return f'{name}-{digest[:12]}'
+
+
+def _latency(model, X, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model.predict(X)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class _RssSampler(threading.Thread):
+    # Highest RSS seen while fitting; catches native allocations tracemalloc misses
+    def __init__(self, interval=0.005):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.process = psutil.Process()
+        self.baseline = self.peak = self.process.memory_info().rss
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+        return self.peak - self.baseline
+
+
+def _fit_memory(model, X, y):
+    # A separate, untimed fit: tracemalloc slows allocation-heavy fits down. Reported
+    # twice: the tracemalloc peak (NumPy buffers and Python objects) and the sampled
+    # RSS growth, which also sees sklearn's native tree buffers but can read low when
+    # a worker reuses memory.
+    sampler = _RssSampler()
+    sampler.start()
+    tracemalloc.start()
+    clone(model).fit(X, y)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'peak_traced_mb': peak / 1e6, 'peak_rss_growth_mb': sampler.stop() / 1e6}
+
+
+def evaluate_fold(model, X, y, train_idx, test_idx, first_fold=False):
+    # Runs in a worker process; `model` is an unfitted prototype. The first fold also
+    # measures fit memory and hands its fitted model back for the serving measurements.
+    X_train, y_train = np.asarray(X[train_idx]), np.asarray(y[train_idx])
+    X_test, y_test = np.asarray(X[test_idx]), np.asarray(y[test_idx])
+
+    fitted = clone(model)
+    start = time.perf_counter()
+    fitted.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    y_pred = fitted.predict(X_test)
+    mse = mean_squared_error(y_test, y_pred)
+    result = {'mse': mse, 'rmse': float(np.sqrt(mse)), 'r2': r2_score(y_test, y_pred), 'fit_seconds': fit_seconds}
+    if first_fold:
+        result.update(_fit_memory(model, X_train, y_train))
+        result['model'] = fitted
+    return result
+
+
+def serving_costs(model, X_test):
+    # Measured in the parent once all fits are done, so no other fold competes for the CPU
+    batch = np.resize(X_test, (10_000, X_test.shape[1]))
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return {
+        'latency_1_row_ms': _latency(model, X_test[:1], 20) * 1000,
+        'latency_10k_rows_ms': _latency(model, batch, 3) * 1000,
+        'artifact_mb': buffer.getbuffer().nbytes / 1e6,
+    }
+
+
+def load_results(path=RESULTS_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_results(results, path=RESULTS_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def evaluate(candidates=CANDIDATES, cv=5, n_jobs=-1, excel_file=EXCEL_FILE, results_path=RESULTS_PATH,
+             force=False):
+    # k-fold CV of every candidate; all (candidate, fold) fits run in parallel.
+    # Candidates already in `results_path` for the same data and folds are skipped.
+    features = load_feature_matrix(excel_file)
+    X, y = features['X'], features['y']
+    data_key = f'v{FEATURE_VERSION}-{file_hash(excel_file)[:16]}'
+    folds = fold_indices(len(y), cv, data_key=data_key)
+
+    results = load_results(results_path)
+    prototypes = {name: make_model() for name, make_model in candidates.items()}
+    keys = {name: candidate_key(name, model, cv, data_key) for name, model in prototypes.items()}
+    pending = [name for name in candidates if force or keys[name] not in results]
+    for name in candidates:
+        if name not in pending:
+            print(f'  {name}: already evaluated, skipping')
+
+    tasks = [(name, i) for name in pending for i in range(cv)]
+    outputs = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(evaluate_fold)(prototypes[name], X, y, *folds[i], first_fold=i == 0)
+        for name, i in tasks
+    )
+
+    by_candidate = {}
+    for (name, _), output in zip(tasks, outputs):
+        by_candidate.setdefault(name, []).append(output)
+    for name, fold_results in by_candidate.items():
+        summary = {metric: float(np.mean([fold[metric] for fold in fold_results]))
+                   for metric in ('mse', 'rmse', 'r2', 'fit_seconds')}
+        summary['r2_std'] = float(np.std([fold['r2'] for fold in fold_results]))
+        first = fold_results[0]
+        summary.update({metric: first[metric] for metric in ('peak_traced_mb', 'peak_rss_growth_mb')})
+        summary.update(serving_costs(first.pop('model'), np.asarray(X[folds[0][1]])))
+        results[keys[name]] = {'model': name, 'cv': cv, 'evaluated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                               **summary}
+        save_results(results, results_path)
+
+    return pd.DataFrame([{**results[keys[name]]} for name in candidates]).set_index('model')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Cross-validate candidate models and compare their serving costs.')
+    parser.add_argument('candidates', nargs='*', default=list(CANDIDATES), choices=list(CANDIDATES))
+    parser.add_argument('--cv', type=int, default=5)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--excel-file', default=EXCEL_FILE)
+    parser.add_argument('--results', default=RESULTS_PATH, help='JSON file the results are kept in')
+    parser.add_argument('--force', action='store_true', help='re-evaluate candidates that already have results')
+    parser.add_argument('--tuned-model', default=MODEL_PATH,
+                        help='pickled model whose parameters rf_tuned uses (default: the served model)')
+    args = parser.parse_args(argv)
+
+    candidates = {name: CANDIDATES[name] for name in args.candidates}
+    if 'rf_tuned' in candidates:
+        candidates['rf_tuned'] = lambda: tuned_model(args.tuned_model)
+    comparison_df = evaluate(candidates, args.cv, args.n_jobs, args.excel_file, args.results, args.force)
+    columns = ['mse', 'rmse', 'r2', 'r2_std', 'fit_seconds', 'latency_1_row_ms', 'latency_10k_rows_ms',
+               'peak_traced_mb', 'peak_rss_growth_mb', 'artifact_mb']
+    print(comparison_df[columns].to_string(float_format='{:.6g}'.format))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import argparse
+import bisect
+import re
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import EXCEL_FILE, load_emission_data
+
+TARGET = 'Supply Chain Emission Factors with Margins'
+KEY_COLUMNS = ['Code', 'Year', 'Substance', 'Source']
+
+
+def model_estimate(rows):
+    # Fallback for combinations not in the published tables
+    from utils.model_registry import get_model, get_scaler
+    from utils.preprocessor import preprocess_input
+
+    scaler = get_scaler()
+    return get_model().predict(scaler.transform(preprocess_input(rows[list(scaler.feature_names_in_)])))
+
+
+def _tokens(text):
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+
+def _trigrams(tokens):
+    # Per-token trigrams, padded so short words and word boundaries still match
+    grams = set()
+    for token in tokens:
+        padded = f' {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _normalize_keys(items):
+    # Codes are stored as text and years as ints, whatever the caller's file had
+    keys = items[KEY_COLUMNS].copy()
+    keys['Code'] = keys['Code'].astype(str)
+    keys['Year'] = keys['Year'].astype('int64')
+    return keys
+
+
+class FactorIndex:
+    # Indexes over the ingested Detail sheets: a hash index on
+    # (Code, Year, Substance, Source) for exact factors, per-code and per-year
+    # row indexes, a sorted name list for prefix search, and token and trigram
+    # posting lists for typo-tolerant name search.
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.factors = self.df[TARGET].to_numpy()
+        keys = _normalize_keys(self.df)
+        self._key_index = pd.MultiIndex.from_frame(keys)
+        if not self._key_index.is_unique:
+            raise ValueError(f'{KEY_COLUMNS} do not identify rows uniquely')
+        self._exact = dict(zip(zip(*(keys[column].tolist() for column in KEY_COLUMNS)), range(len(keys))))
+        self._by_code = keys.groupby('Code').indices
+        self._by_year = keys.groupby('Year').indices
+
+        names = self.df.drop_duplicates('Name')[['Name', 'Code']]
+        pairs = sorted(zip(names['Name'].str.lower(), names['Name'], names['Code'].astype(str)))
+        self._names_lower = [lower for lower, _, _ in pairs]
+        self._names = [(name, code) for _, name, code in pairs]
+
+        by_token, by_trigram = defaultdict(list), defaultdict(list)
+        trigram_counts = []
+        for i, lower in enumerate(self._names_lower):
+            tokens = set(_tokens(lower))
+            grams = _trigrams(tokens)
+            for token in tokens:
+                by_token[token].append(i)
+            for gram in grams:
+                by_trigram[gram].append(i)
+            trigram_counts.append(len(grams))
+        self._by_token = {token: np.array(ids, dtype=np.intp) for token, ids in by_token.items()}
+        self._by_trigram = {gram: np.array(ids, dtype=np.intp) for gram, ids in by_trigram.items()}
+        self._trigram_counts = np.array(trigram_counts, dtype=np.float64)
+
+    @classmethod
+    def from_workbook(cls, excel_file=EXCEL_FILE):
+        return cls(load_emission_data(excel_file))
+
+    def lookup(self, code, year, substance, source='Commodity'):
+        # Published factor with margins, or None when the combination is not in the tables
+        position = self._exact.get((str(code), int(year), substance, source))
+        return None if position is None else self.factors[position]
+
+    def rows(self, code=None, year=None):
+        positions = None
+        if code is not None:
+            positions = self._by_code.get(str(code), np.empty(0, dtype=np.intp))
+        if year is not None:
+            by_year = self._by_year.get(int(year), np.empty(0, dtype=np.intp))
+            positions = by_year if positions is None else np.intersect1d(positions, by_year)
+        return self.df if positions is None else self.df.iloc[positions]
+
+    def search_names(self, query, limit=10, cutoff=0.3):
+        # Case-insensitive prefix matches first, then fuzzy matches if there are none
+        query = query.strip().lower()
+        start = bisect.bisect_left(self._names_lower, query)
+        matches = []
+        for i in range(start, len(self._names_lower)):
+            if not self._names_lower[i].startswith(query) or len(matches) >= limit:
+                break
+            matches.append(self._names[i])
+        if matches:
+            return matches
+        return self.fuzzy_search(query, limit, cutoff)
+
+    def fuzzy_search(self, query, limit=10, cutoff=0.3):
+        # Names ranked by whole query words they contain, then by trigram overlap
+        # (Dice coefficient); only names sharing a word or at least `cutoff` of the
+        # trigrams are returned. Word order and single-letter typos don't matter.
+        tokens = set(_tokens(query))
+        grams = _trigrams(tokens)
+        if not grams:
+            return []
+        shared = np.zeros(len(self._names))
+        for gram in grams:
+            ids = self._by_trigram.get(gram)
+            if ids is not None:
+                shared[ids] += 1
+        words = np.zeros(len(self._names))
+        for token in tokens:
+            ids = self._by_token.get(token)
+            if ids is not None:
+                words[ids] += 1
+        dice = 2 * shared / (len(grams) + self._trigram_counts)
+        candidates = np.flatnonzero((words > 0) | (dice >= cutoff))
+        order = np.lexsort((-dice[candidates], -words[candidates]))[:limit]
+        return [self._names[i] for i in candidates[order]]
+
+    def lookup_many(self, items):
+        # Vectorised exact lookup for a frame with KEY_COLUMNS; NaN where not published
+        positions = self._key_index.get_indexer(pd.MultiIndex.from_frame(_normalize_keys(items)))
+        factors = np.full(len(positions), np.nan)
+        found = positions >= 0
+        factors[found] = self.factors[positions[found]]
+        return factors, found
+
+    def resolve(self, items, estimate=model_estimate):
+        # Published factor where there is one; the model estimates the remaining rows
+        # in one batch (those rows need the ten model input columns).
+        factors, found = self.lookup_many(items)
+        out = items.copy(deep=False)
+        source = np.where(found, 'table', 'model').astype(object)
+        if estimate is not None and not found.all():
+            factors[~found] = estimate(items[~found])
+        elif not found.all():
+            source[~found] = None
+        out['Emission Factor'] = factors
+        out['Factor Source'] = source
+        return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Look up published emission factors by commodity/industry name or code.')
+    parser.add_argument('query', help='name prefix (fuzzy-matched if nothing starts with it) or NAICS code')
+    parser.add_argument('--year', type=int, default=2016)
+    parser.add_argument('--substance', default='carbon dioxide')
+    parser.add_argument('--source', default='Commodity', choices=['Commodity', 'Industry'])
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    index = FactorIndex.from_workbook()
+    by_code = index.rows(code=args.query)
+    if len(by_code):
+        matches = [(by_code['Name'].iat[0], args.query)]
+    else:
+        matches = index.search_names(args.query, args.limit)
+    for name, code in matches:
+        start = time.perf_counter()
+        factor = index.lookup(code, args.year, args.substance, args.source)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+        print(f'{code:<8} {name[:60]:<60} {factor} ({elapsed_us:.1f}us)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import threading
+import weakref
+
+import numpy as np
+
+from utils.preprocessor import CATEGORY_MAPS, FEATURE_COLUMNS
+
+
+class FeatureSchema:
+    # Column order and per-column encoding pinned once, when the scaler is loaded.
+    # A form dict is written straight into a preallocated float64 row, without
+    # building a DataFrame; encode() gives the same values as preprocess_input and
+    # scale() the same as scaler.transform.
+    def __init__(self, columns, mean, scale, category_maps=CATEGORY_MAPS):
+        self.columns = tuple(columns)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(scale, dtype=np.float64)
+        # (position, column, mapping or None) in row order
+        self._fields = tuple((i, column, category_maps.get(column)) for i, column in enumerate(self.columns))
+        self._local = threading.local()
+
+    @classmethod
+    def from_scaler(cls, scaler, expected=FEATURE_COLUMNS):
+        # The one place the column order is checked, instead of on every request
+        columns = [str(column) for column in scaler.feature_names_in_]
+        if columns != list(expected):
+            raise ValueError(f'Scaler columns {columns} do not match the training columns {list(expected)}')
+        if scaler.with_mean is False or scaler.with_std is False:
+            raise ValueError('FeatureSchema expects a StandardScaler fitted with mean and std')
+        return cls(columns, scaler.mean_, scaler.scale_)
+
+    def _buffer(self):
+        # One (1, n) row per thread, reused across calls
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.empty((1, len(self.columns)), dtype=np.float64)
+        return row
+
+    def encode(self, values, out=None):
+        # Encoded but unscaled row. Without `out` this is the thread's shared buffer,
+        # which the next call on the same thread overwrites.
+        row = self._buffer() if out is None else out
+        flat = row[0]
+        for i, column, mapping in self._fields:
+            value = values[column]
+            if mapping is not None:
+                code = mapping.get(value)
+                if code is None:
+                    raise ValueError(f'Unknown {column} labels: [{value!r}]; expected one of {list(mapping)}')
+                flat[i] = code
+            else:
+                flat[i] = value
+        return row
+
+    def scale(self, X, out=None):
+        # Same operations, in the same order, as StandardScaler.transform
+        out = np.subtract(X, self.mean, out=out)
+        out /= self.std
+        return out
+
+    def row(self, values, out=None):
+        row = self.encode(values, out)
+        return self.scale(row, out=row)
+
+
+_schemas = weakref.WeakKeyDictionary()
+
+
+def feature_schema(scaler):
+    # Built once per loaded scaler, so a scaler reloaded by the registry is rechecked
+    schema = _schemas.get(scaler)
+    if schema is None:
+        schema = _schemas[scaler] = FeatureSchema.from_scaler(scaler)
+    return schema
@@ -0,0 +1,380 @@
+import json
+import struct
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+MAGIC = b'GHGFRST1'
+ALIGNMENT = 64
+COMPACT_ARRAYS = ('feature', 'threshold', 'children', 'value', 'missing_left', 'is_leaf', 'roots')
+# From this many rows up, forests that have sklearn Tree objects evaluate them one
+# at a time with sklearn's Cython traversal. The NumPy level-by-level walk wins on
+# small batches, where sklearn's per-call overhead dominates, but is about 3x slower
+# on large ones.
+NATIVE_MIN_ROWS = 256
+
+
+class CompiledForest:
+    # A fitted tree ensemble flattened into contiguous node arrays. Tree t's nodes
+    # start at roots[t]; child indices are global, and leaves point at themselves
+    # so the traversal loop needs no per-tree branching. children[2 * node] is the
+    # left child and children[2 * node + 1] the right one. Batches of at least
+    # `native_min_rows` go through sklearn Tree objects instead when the forest was
+    # compiled from an estimator (its trees are reused). A forest loaded from a
+    # compact file stays on the NumPy walk, so its memory-mapped arrays remain the
+    # only copy; native_rebuild=True opts in to rebuilding private Tree objects.
+    def __init__(self, feature, threshold, children, value, missing_left, roots,
+                 n_features, cast_float32=True, is_leaf=None, trees=None, native_min_rows=NATIVE_MIN_ROWS,
+                 native_rebuild=False):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.missing_left = missing_left
+        self.roots = roots
+        self.n_features = n_features
+        # sklearn compares float32 inputs against float64 thresholds
+        self.cast_float32 = cast_float32
+        self.is_leaf = children[0::2] == np.arange(len(feature)) if is_leaf is None else is_leaf
+        self.native_min_rows = native_min_rows
+        self.native_rebuild = native_rebuild
+        self._trees = trees
+        self._trees_lock = threading.Lock()
+
+    @property
+    def left(self):
+        return self.children[0::2]
+
+    @property
+    def right(self):
+        return self.children[1::2]
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_estimator(cls, model):
+        trees = [e.tree_ for e in getattr(model, 'estimators_', [model])]
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise ValueError('Only single-output regressors can be compiled')
+
+        sizes = np.array([tree.node_count for tree in trees])
+        roots = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        feature, threshold, left, right, value, missing_left = [], [], [], [], [], []
+        for tree, offset in zip(trees, roots):
+            nodes = np.arange(tree.node_count) + offset
+            leaf = tree.children_left < 0
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(np.where(leaf, 0.0, tree.threshold))
+            left.append(np.where(leaf, nodes, tree.children_left + offset))
+            right.append(np.where(leaf, nodes, tree.children_right + offset))
+            value.append(tree.value[:, 0, 0])
+            missing_left.append(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=bool)))
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            children=np.stack([np.concatenate(left), np.concatenate(right)], axis=1).ravel().astype(np.int32),
+            value=np.concatenate(value).astype(np.float64),
+            missing_left=np.concatenate(missing_left).astype(bool),
+            roots=roots.astype(np.int32),
+            n_features=trees[0].n_features,
+            trees=trees,
+        )
+
+    def native_trees(self):
+        # sklearn Tree objects for the large-batch path. Rebuilding them for a loaded
+        # compact file copies every node into this process (about 170 MB USS for the
+        # 200-tree forest), which is why it is opt-in.
+        with self._trees_lock:
+            if self._trees is None:
+                self._trees = [self._build_tree(t) for t in range(self.n_trees)]
+            return self._trees
+
+    def _build_tree(self, t):
+        from sklearn.tree._tree import NODE_DTYPE, Tree
+
+        start = self.roots[t]
+        end = self.roots[t + 1] if t + 1 < self.n_trees else self.n_nodes
+        leaf = np.asarray(self.is_leaf[start:end])
+        nodes = np.zeros(end - start, dtype=NODE_DTYPE)
+        nodes['left_child'] = np.where(leaf, -1, self.children[2 * start:2 * end:2] - start)
+        nodes['right_child'] = np.where(leaf, -1, self.children[2 * start + 1:2 * end:2] - start)
+        nodes['feature'] = np.where(leaf, -2, self.feature[start:end])
+        nodes['threshold'] = np.where(leaf, -2.0, self.threshold[start:end])
+        if 'missing_go_to_left' in NODE_DTYPE.names:
+            nodes['missing_go_to_left'] = self.missing_left[start:end]
+        # Depth only matters to sklearn for bookkeeping; children always follow parents
+        depth = np.zeros(end - start, dtype=np.intp)
+        frontier = np.flatnonzero(~leaf)
+        while frontier.size:
+            for child in (nodes['left_child'][frontier], nodes['right_child'][frontier]):
+                depth[child] = depth[frontier] + 1
+            frontier = np.concatenate([nodes['left_child'][frontier], nodes['right_child'][frontier]])
+            frontier = frontier[~leaf[frontier]]
+        tree = Tree(self.n_features, np.array([1], dtype=np.intp), 1)
+        tree.__setstate__({'max_depth': int(depth.max()), 'node_count': end - start, 'nodes': nodes,
+                           'values': np.asarray(self.value[start:end], dtype=np.float64).reshape(-1, 1, 1)})
+        return tree
+
+    def _native(self, X):
+        return (self.cast_float32 and len(X) >= self.native_min_rows
+                and (self._trees is not None or self.native_rebuild))
+
+    def _native_tree_values(self, X, n_jobs=1):
+        # (rows, trees) leaf values, one Cython traversal per tree
+        trees = self.native_trees()
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        values = np.empty((len(X), len(trees)), dtype=np.float64)
+
+        def fill(columns):
+            for t in columns:
+                values[:, t] = trees[t].predict(X)[:, 0]
+
+        if n_jobs > 1:
+            with ThreadPoolExecutor(n_jobs) as pool:
+                list(pool.map(fill, np.array_split(np.arange(len(trees)), n_jobs)))
+        else:
+            fill(range(len(trees)))
+        return values
+
+    def _check_input(self, X):
+        X = np.asarray(X, dtype=np.float32 if self.cast_float32 else np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f'X has {X.shape[1]} features, but the forest expects {self.n_features}')
+        return X
+
+    def _apply_block(self, X, unroll=4):
+        n_rows, n_trees = len(X), self.n_trees
+        flat_X = X.ravel()
+        # One slot per (tree, row) pair, tree-major so neighbouring slots walk the
+        # same tree's nodes
+        nodes = np.repeat(self.roots, n_rows)
+        offsets = np.tile(np.arange(n_rows, dtype=np.int64) * self.n_features, n_trees)
+        check_missing = self.missing_left.any() and np.isnan(flat_X).any()
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            node = nodes[active]
+            offset = offsets[active]
+            # Leaves loop back to themselves, so a few extra steps are harmless and
+            # the finished slots only need to be dropped every `unroll` levels
+            for _ in range(unroll):
+                x = flat_X[offset + self.feature[node]]
+                go_left = x <= self.threshold[node]
+                if check_missing:
+                    go_left |= np.isnan(x) & self.missing_left[node]
+                node = self.children[2 * node + ~go_left]
+            nodes[active] = node
+            active = active[~self.is_leaf[node]]
+        return nodes.reshape(n_trees, n_rows).T
+
+    def apply(self, X, block_size=1 << 20, n_jobs=1):
+        # Leaf index reached in every tree, shape (rows, trees). Rows are processed
+        # in blocks so the working set stays around `block_size` (row, tree) slots;
+        # NumPy releases the GIL in the gathers, so blocks can run on threads.
+        X = self._check_input(X)
+        step = max(1, block_size // self.n_trees)
+        if n_jobs > 1:
+            step = min(step, -(-len(X) // n_jobs))
+        if len(X) <= step:
+            return self._apply_block(X)
+        blocks = [X[i:i + step] for i in range(0, len(X), step)]
+        if n_jobs > 1:
+            with ThreadPoolExecutor(n_jobs) as pool:
+                return np.concatenate(list(pool.map(self._apply_block, blocks)))
+        return np.concatenate([self._apply_block(block) for block in blocks])
+
+    def leaf_values(self, X, block_size=1 << 20, n_jobs=1):
+        X = self._check_input(X)
+        if self._native(X):
+            return self._native_tree_values(X, n_jobs)
+        return self.value[self.apply(X, block_size, n_jobs)]
+
+    def predict(self, X, block_size=1 << 20, n_jobs=1):
+        X = self._check_input(X)
+        if self._native(X) and n_jobs <= 1:
+            # Accumulated tree by tree, without a (rows, trees) matrix
+            X = np.ascontiguousarray(X, dtype=np.float32)
+            total = np.zeros(len(X))
+            for tree in self.native_trees():
+                total += tree.predict(X)[:, 0]
+            return total / self.n_trees
+        values = self.leaf_values(X, block_size, n_jobs).astype(np.float64, copy=False)
+        # RandomForestRegressor adds tree outputs one at a time into a zeroed buffer
+        # and divides at the end; a cumulative sum keeps that exact summation order.
+        return np.cumsum(values, axis=1)[:, -1] / self.n_trees
+
+    def predict_interval(self, X, quantiles=(0.05, 0.95), block_size=1 << 20, n_jobs=1):
+        # Spread of the individual trees' predictions, from one (rows x trees) pass.
+        # This is the ensemble's disagreement, not a calibrated predictive interval.
+        values = self.leaf_values(X, block_size, n_jobs).astype(np.float64, copy=False)
+        bounds = np.quantile(values, quantiles, axis=1)
+        return {
+            'mean': np.cumsum(values, axis=1)[:, -1] / self.n_trees,
+            'std': values.std(axis=1),
+            'quantiles': dict(zip(quantiles, bounds)),
+        }
+
+
+_compiled = weakref.WeakKeyDictionary()
+
+
+def compiled_forest(model):
+    # CompiledForest for a fitted sklearn forest, built once per model object (so a
+    # model reloaded by the registry is recompiled), or None for other models
+    if isinstance(model, CompiledForest):
+        return model
+    if not hasattr(model, 'estimators_'):
+        return None
+    forest = _compiled.get(model)
+    if forest is None:
+        forest = _compiled[model] = CompiledForest.from_estimator(model)
+    return forest
+
+
+def _floor_float32(values):
+    # Largest float32 <= each value. For float32 inputs, x <= t and x <= floor32(t)
+    # agree, so casting thresholds this way does not change any split.
+    rounded = values.astype(np.float32)
+    too_big = rounded.astype(np.float64) > values
+    rounded[too_big] = np.nextafter(rounded[too_big], np.float32(-np.inf))
+    return rounded
+
+
+def save_compact(forest, path, precision='float32'):
+    # Flat file: magic, header length, JSON header, then 64-byte aligned raw arrays.
+    # Thresholds and leaf values are stored as float32 by default, node features as
+    # int16 when they fit, and child links as int32.
+    single = precision == 'float32'
+    if single and forest.cast_float32:
+        threshold = _floor_float32(forest.threshold)
+    else:
+        threshold = forest.threshold.astype(np.float32 if single else np.float64)
+    arrays = {
+        'feature': forest.feature.astype(np.int16 if forest.n_features < 2 ** 15 else np.int32),
+        'threshold': threshold,
+        'children': forest.children.astype(np.int32),
+        'value': forest.value.astype(np.float32 if single else np.float64),
+        'missing_left': forest.missing_left.astype(np.uint8),
+        'is_leaf': forest.is_leaf.astype(np.uint8),
+        'roots': forest.roots.astype(np.int32),
+    }
+
+    layout, offset = {}, 0
+    for name in COMPACT_ARRAYS:
+        array = np.ascontiguousarray(arrays[name])
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({
+        'n_features': forest.n_features,
+        'cast_float32': forest.cast_float32,
+        'arrays': layout,
+    }).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        for name in COMPACT_ARRAYS:
+            f.seek(data_start + layout[name]['offset'])
+            f.write(np.ascontiguousarray(arrays[name]).tobytes())
+        f.truncate(data_start + offset)
+
+
+def load_compact(path, mmap=True, native_rebuild=False):
+    # With mmap the arrays are read-only views on the page cache, so every process
+    # that loads the same file shares one physical copy. native_rebuild trades that
+    # for sklearn-speed large batches (see CompiledForest).
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a compact forest file')
+        (header_size,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size))
+    data_start = -(-(len(MAGIC) + 8 + header_size) // ALIGNMENT) * ALIGNMENT
+
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        buffer = np.fromfile(path, dtype=np.uint8)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        start = data_start + spec['offset']
+        count = int(np.prod(spec['shape']))
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+
+    return CompiledForest(
+        feature=arrays['feature'],
+        threshold=arrays['threshold'],
+        children=arrays['children'],
+        value=arrays['value'],
+        missing_left=arrays['missing_left'].view(bool),
+        roots=arrays['roots'],
+        n_features=header['n_features'],
+        cast_float32=header['cast_float32'],
+        is_leaf=arrays['is_leaf'].view(bool),
+        native_rebuild=native_rebuild,
+    )
+
+
+def compare_on_test_split(model, compact):
+    # Accuracy of the compact forest against the original on the notebook's test split
+    from sklearn.metrics import mean_squared_error, r2_score
+    from sklearn.model_selection import train_test_split
+
+    from utils.train import load_feature_matrix
+
+    features = load_feature_matrix()
+    _, X_test, _, y_test = train_test_split(np.asarray(features['X']), np.asarray(features['y']),
+                                            test_size=0.2, random_state=42)
+    original = model.predict(X_test)
+    compressed = compact.predict(X_test)
+    return {
+        'rows': len(y_test),
+        'max_abs_diff': float(np.max(np.abs(original - compressed))),
+        'changed_predictions': int((original != compressed).sum()),
+        'original_rmse': float(np.sqrt(mean_squared_error(y_test, original))),
+        'compact_rmse': float(np.sqrt(mean_squared_error(y_test, compressed))),
+        'original_r2': float(r2_score(y_test, original)),
+        'compact_r2': float(r2_score(y_test, compressed)),
+    }
+
+
+def main(argv=None):
+    import argparse
+    import os
+
+    import joblib
+
+    from utils.model_registry import MODEL_PATH
+
+    parser = argparse.ArgumentParser(description='Export the forest to the compact memory-mappable format.')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--output', default=os.path.splitext(MODEL_PATH)[0] + '.ghgf')
+    parser.add_argument('--precision', default='float32', choices=['float32', 'float64'])
+    parser.add_argument('--no-report', action='store_true', help='skip the test-split accuracy comparison')
+    args = parser.parse_args(argv)
+
+    model = joblib.load(args.model)
+    save_compact(CompiledForest.from_estimator(model), args.output, args.precision)
+    print(f'{args.model}: {os.path.getsize(args.model) / 1e6:.1f} MB -> '
+          f'{args.output}: {os.path.getsize(args.output) / 1e6:.1f} MB')
+
+    if not args.no_report:
+        report = compare_on_test_split(model, load_compact(args.output))
+        print(f"Test split ({report['rows']} rows): {report['changed_predictions']} predictions changed, "
+              f"max abs diff {report['max_abs_diff']:.3g}")
+        print(f"RMSE {report['original_rmse']:.6f} -> {report['compact_rmse']:.6f}, "
+              f"R² {report['original_r2']:.6f} -> {report['compact_r2']:.6f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+import argparse
+import sys
+
+import joblib
+import numpy as np
+
+from utils.forest import CompiledForest
+from utils.model_registry import MODEL_PATH, SCALER_PATH
+
+FUSED_PATH = 'models/fused_model.pkl'
+
+
+def _scaled(x, mean, scale):
+    # What the two-stage pipeline compares: scaler output cast to float32 by the trees
+    return ((x - mean) / scale).astype(np.float32)
+
+
+def unscale_thresholds(threshold, mean, scale):
+    # Largest raw x with float32((x - mean) / scale) <= threshold, found by bisection.
+    # The naive threshold * scale + mean can land on the wrong side of a training
+    # value because of the float32 rounding, so splits would not match exactly.
+    guess = threshold * scale + mean
+    width = (np.abs(guess) + scale) * 1e-6
+    lo, hi = guess - width, guess + width
+    while (bad := _scaled(lo, mean, scale) > threshold).any():
+        width = np.where(bad, width * 2, width)
+        lo = np.where(bad, guess - width, lo)
+    while (bad := _scaled(hi, mean, scale) <= threshold).any():
+        width = np.where(bad, width * 2, width)
+        hi = np.where(bad, guess + width, hi)
+    while True:
+        mid = lo + (hi - lo) / 2
+        open_ = (mid > lo) & (mid < hi)
+        if not open_.any():
+            return lo
+        below = _scaled(mid, mean, scale) <= threshold
+        lo = np.where(open_ & below, mid, lo)
+        hi = np.where(open_ & ~below, mid, hi)
+
+
+class FusedPredictor:
+    # Model with the StandardScaler folded in, so it takes the encoded (unscaled)
+    # feature matrix directly and no scaled copy is allocated per call.
+    def __init__(self, kind, feature_names, coef=None, intercept=None, forest=None):
+        self.kind = kind
+        self.feature_names = list(feature_names)
+        self.coef = coef
+        self.intercept = intercept
+        self.forest = forest
+
+    @classmethod
+    def from_pipeline(cls, model, scaler):
+        mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(scaler.n_features_in_)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(scaler.n_features_in_)
+
+        if hasattr(model, 'estimators_') or hasattr(model, 'tree_'):
+            forest = CompiledForest.from_estimator(model)
+            split = ~forest.is_leaf
+            feature = forest.feature[split]
+            forest.threshold = forest.threshold.copy()
+            forest.threshold[split] = unscale_thresholds(forest.threshold[split], mean[feature], scale[feature])
+            forest.cast_float32 = False
+            return cls('forest', scaler.feature_names_in_, forest=forest)
+
+        if hasattr(model, 'coef_'):
+            coef = np.asarray(model.coef_, dtype=np.float64) / scale
+            intercept = model.intercept_ - coef @ mean
+            return cls('linear', scaler.feature_names_in_, coef=coef, intercept=intercept)
+
+        raise TypeError(f'Cannot fuse a scaler into {type(model).__name__}')
+
+    def predict(self, X):
+        if hasattr(X, 'columns'):
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=np.float64)
+        if self.kind == 'forest':
+            return self.forest.predict(X)
+        return X @ self.coef + self.intercept
+
+
+def verify(fused, model, scaler, X, rtol=1e-7, atol=1e-9):
+    # Compare against the two-stage scaler.transform -> model.predict pipeline
+    expected = model.predict(scaler.transform(X))
+    actual = fused.predict(X)
+    close = np.isclose(actual, expected, rtol=rtol, atol=atol)
+    return {
+        'rows': len(expected),
+        'mismatched_rows': int((~close).sum()),
+        'max_abs_error': float(np.max(np.abs(actual - expected))),
+        'passed': bool(close.all()),
+    }
+
+
+def training_features(feature_names):
+    from utils.data_loader import load_emission_data
+    from utils.preprocessor import preprocess_input
+
+    return preprocess_input(load_emission_data()[list(feature_names)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fold the scaler into the model and export a fused predictor.')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    parser.add_argument('--output', default=FUSED_PATH)
+    parser.add_argument('--verify', action='store_true', help='check against the two-stage pipeline on the training set')
+    parser.add_argument('--rtol', type=float, default=1e-7)
+    parser.add_argument('--atol', type=float, default=1e-9)
+    args = parser.parse_args(argv)
+
+    model = joblib.load(args.model)
+    scaler = joblib.load(args.scaler)
+    fused = FusedPredictor.from_pipeline(model, scaler)
+
+    if args.verify:
+        report = verify(fused, model, scaler, training_features(fused.feature_names), args.rtol, args.atol)
+        print(f"Verified {report['rows']} rows: {report['mismatched_rows']} mismatched, "
+              f"max abs error {report['max_abs_error']:.3g}")
+        if not report['passed']:
+            print('Fused predictor does not match the two-stage pipeline, not exporting')
+            sys.exit(1)
+
+    joblib.dump(fused, args.output)
+    print(f'Saved {fused.kind} fused predictor to {args.output}')
+
+
+if __name__ == '__main__':
+    # Import through the package so the pickled class resolves as utils.fused.FusedPredictor
+    from utils.fused import main
+    main()
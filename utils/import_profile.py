@@ -0,0 +1,67 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# What app.py ends up importing before the first prediction can run
+DEFAULT_MODULES = ('streamlit', 'numpy', 'pandas', 'joblib', 'sklearn.ensemble',
+                   'utils.preprocessor', 'utils.model_registry', 'utils.prediction_cache')
+
+
+def run_importtime(modules, python=sys.executable):
+    code = '; '.join(f'import {module}' for module in modules)
+    proc = subprocess.run([python, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True)
+    # Lines look like: "import time:       123 |       4567 |   package.module"
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+        })
+    return entries
+
+
+def summarize(entries, top=15):
+    by_package = {}
+    for entry in entries:
+        package = entry['module'].split('.')[0]
+        by_package[package] = by_package.get(package, 0) + entry['self_us']
+    return {
+        'total_us': sum(entry['self_us'] for entry in entries),
+        'modules': len(entries),
+        'by_package_us': dict(sorted(by_package.items(), key=lambda item: -item[1])[:top]),
+        'slowest_modules': sorted(entries, key=lambda entry: -entry['self_us'])[:top],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Profile import time of the modules the apps load at startup.')
+    parser.add_argument('modules', nargs='*', default=list(DEFAULT_MODULES))
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', help='append the report to this JSON-lines file to track startup over time')
+    args = parser.parse_args(argv)
+
+    report = summarize(run_importtime(args.modules), args.top)
+    print(f"Imported {report['modules']} modules in {report['total_us'] / 1e6:.2f}s")
+    print('\nBy top-level package:')
+    for package, us in report['by_package_us'].items():
+        print(f'  {package:<30} {us / 1000:9.1f} ms')
+    print('\nSlowest modules (self time):')
+    for entry in report['slowest_modules']:
+        print(f"  {entry['module']:<50} {entry['self_us'] / 1000:9.1f} ms")
+
+    if args.json:
+        report['timestamp'] = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        report['imported'] = args.modules
+        with open(args.json, 'a') as f:
+            f.write(json.dumps(report) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import time
+
+import joblib
+import numpy as np
+from sklearn.linear_model import SGDRegressor
+from sklearn.neural_network import MLPRegressor
+from sklearn.preprocessing import StandardScaler
+
+from utils.batch_score import iter_chunks
+from utils.data_loader import EXCEL_FILE, YEARS, detail_sheets
+from utils.ingest import parse_sheet
+from utils.model_registry import MODEL_PATH, SCALER_PATH
+from utils.preprocessor import FEATURE_COLUMNS
+from utils.train import TARGET, build_features
+
+
+def iter_partitions(excel_file=EXCEL_FILE, years=YEARS, extra_files=(), chunksize=100_000):
+    # One year/source sheet at a time, then any extra CSV/Parquet files in chunks.
+    # Only the current partition is ever held in memory.
+    for sheet_name, year, source in detail_sheets(years):
+        yield sheet_name, parse_sheet(excel_file, sheet_name, year, source)
+    for path in extra_files:
+        for i, chunk in enumerate(iter_chunks(path, chunksize)):
+            yield f'{path}[{i}]', chunk
+
+
+def make_regressor(kind, random_state=42):
+    if kind == 'sgd':
+        return SGDRegressor(random_state=random_state)
+    if kind == 'mlp':
+        return MLPRegressor(hidden_layer_sizes=(64, 32), random_state=random_state)
+    raise ValueError(f'Unknown incremental model {kind!r}, expected sgd or mlp')
+
+
+def train_incremental(partitions, kind='sgd', epochs=5, random_state=42):
+    # `partitions` is a callable returning a fresh iterator, since the data is
+    # streamed once for the scaler statistics and once per training epoch
+    scaler = StandardScaler()
+    for name, df in partitions():
+        X, _ = build_features(df)
+        scaler.partial_fit(X)
+
+    model = make_regressor(kind, random_state)
+    rng = np.random.default_rng(random_state)
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        rows = 0
+        for name, df in partitions():
+            X, y = build_features(df)
+            order = rng.permutation(len(y))
+            model.partial_fit(scaler.transform(X)[order], y[order])
+            rows += len(y)
+        print(f'  epoch {epoch + 1}/{epochs}: {rows} rows in {time.perf_counter() - start:.2f}s')
+    return model, scaler
+
+
+def evaluate_incremental(model, scaler, partitions):
+    # Streaming R2 / RMSE, accumulated partition by partition
+    n = sse = total = total_sq = 0.0
+    for name, df in partitions():
+        X, y = build_features(df)
+        residual = y - model.predict(scaler.transform(X))
+        n += len(y)
+        sse += float(residual @ residual)
+        total += float(y.sum())
+        total_sq += float(y @ y)
+    sst = total_sq - total * total / n
+    return {'rows': int(n), 'rmse': (sse / n) ** 0.5, 'r2': 1 - sse / sst if sst else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Train the GHG emission model incrementally, one year/source partition at a time.')
+    parser.add_argument('--excel-file', default=EXCEL_FILE)
+    parser.add_argument('--extra', nargs='*', default=[],
+                        help=f'CSV/Parquet files with the model inputs and {TARGET!r}')
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--model-type', default='sgd', choices=['sgd', 'mlp'])
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    args = parser.parse_args(argv)
+
+    def partitions():
+        return iter_partitions(args.excel_file, YEARS, args.extra, args.chunksize)
+
+    model, scaler = train_incremental(partitions, args.model_type, args.epochs)
+    report = evaluate_incremental(model, scaler, partitions)
+    print(f"Training set: {report['rows']} rows, RMSE {report['rmse']:.6f}, R² {report['r2']:.5f}")
+
+    joblib.dump(model, args.model)
+    joblib.dump(scaler, args.scaler)
+    print(f'Saved {args.model} and {args.scaler} (inputs: {len(FEATURE_COLUMNS)} columns)')
+
+
+if __name__ == '__main__':
+    main()
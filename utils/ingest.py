@@ -0,0 +1,68 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from utils.data_loader import EXCEL_FILE, YEARS, detail_sheets, normalize_sheet
+
+
+class IngestionError(Exception):
+    def __init__(self, errors):
+        self.errors = errors
+        lines = [f'{sheet}: {error}' for sheet, error in errors.items()]
+        super().__init__('Failed to ingest sheets:\n' + '\n'.join(lines))
+
+
+def parse_sheet(excel_file, sheet_name, year, source):
+    # Streaming read-only parse, so a worker never holds the whole workbook
+    wb = load_workbook(excel_file, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        header = next(rows)
+        columns = [f'Unnamed: {i}' if name is None else str(name) for i, name in enumerate(header)]
+        records = [row for row in rows if any(value is not None for value in row)]
+    finally:
+        wb.close()
+    df = pd.DataFrame.from_records(records, columns=columns)
+    # Blank columns come back as object/None, read_excel gives float NaN
+    empty = df.columns[df.isna().all()]
+    df[empty] = df[empty].astype('float64')
+    return normalize_sheet(df, year, source)
+
+
+def _parse_sheet_safe(excel_file, sheet_name, year, source):
+    try:
+        return sheet_name, parse_sheet(excel_file, sheet_name, year, source), None
+    except Exception as e:
+        return sheet_name, None, f'{type(e).__name__}: {e}'
+
+
+def ingest_workbook(excel_file=EXCEL_FILE, years=YEARS, max_workers=None, strict=True):
+    sheets = detail_sheets(years)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(sheets))
+
+    if max_workers == 1:
+        results = [_parse_sheet_safe(excel_file, *sheet) for sheet in sheets]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_parse_sheet_safe, excel_file, *sheet) for sheet in sheets]
+            results = [future.result() for future in futures]
+
+    frames = [df for _, df, error in results if error is None]
+    errors = {sheet: error for sheet, _, error in results if error is not None}
+    if errors and (strict or not frames):
+        raise IngestionError(errors)
+    for sheet, error in errors.items():
+        print(f'Error processing sheet {sheet}: {error}')
+
+    # Workers finish in any order, but results keep the sheet order
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    df = ingest_workbook()
+    print(f'Ingested {len(df)} rows in {time.perf_counter() - start:.2f}s')
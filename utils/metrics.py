@@ -0,0 +1,276 @@
+import bisect
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+
+# Latency buckets in seconds, roughly x2.5 apart from 50us to 10s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+
+class Histogram:
+    # Fixed buckets: counts[i] counts values in (buckets[i-1], buckets[i]], the last slot is +Inf.
+    # counts, count and sum are cumulative since start, as Prometheus expects. The
+    # quantiles are rolling: they come from a ring of `slots` per-interval bucket
+    # counts covering the last `window` seconds, so a new spike shows up in them.
+    def __init__(self, buckets=LATENCY_BUCKETS, window=300.0, slots=10, clock=time.monotonic):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.window = window
+        self._interval = window / slots
+        self._ring = [[0] * len(self.counts) for _ in range(slots)]
+        self._ring_ticks = [None] * slots
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        tick = int(self._clock() // self._interval)
+        slot = tick % len(self._ring)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if self._ring_ticks[slot] != tick:
+                # First observation in a new interval: the slot's old counts expired
+                self._ring[slot] = [0] * len(self.counts)
+                self._ring_ticks[slot] = tick
+            self._ring[slot][index] += 1
+
+    def recent_counts(self):
+        # Bucket counts over the last `window` seconds (the current interval included)
+        oldest = int(self._clock() // self._interval) - len(self._ring) + 1
+        totals = [0] * len(self.counts)
+        with self._lock:
+            for tick, counts in zip(self._ring_ticks, self._ring):
+                if tick is not None and tick >= oldest:
+                    totals = [total + count for total, count in zip(totals, counts)]
+        return totals
+
+    def quantile(self, q, recent=True):
+        # Upper bound of the bucket holding the q-th observation, over the window
+        # by default or since start with recent=False
+        if recent:
+            counts = self.recent_counts()
+        else:
+            with self._lock:
+                counts = list(self.counts)
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        # count, sum, mean and buckets since start; window_count and the quantiles
+        # over the last `window` seconds
+        recent = self.recent_counts()
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'window_seconds': self.window,
+            'window_count': sum(recent),
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {str(bound): count for bound, count in zip(self.buckets + ('+Inf',), self.counts)},
+        }
+
+
+class _NullTimer:
+    # Shared no-op context, so disabled instrumentation costs one method call
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _StageTimer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+# Counters kept per timed unit: (units, rows, errors)
+_COUNTERS = {
+    'request': ('requests_total', 'rows_total', 'errors_total'),
+    'batch': ('batches_total', 'batch_rows_total', 'batch_errors_total'),
+}
+
+
+class _RequestTimer:
+    def __init__(self, instrumentation, rows, kind='request', profile=True):
+        self.instrumentation = instrumentation
+        self.rows = rows
+        self.kind = kind
+        self.profile = profile
+        self.profiler = None
+
+    def __enter__(self):
+        inst = self.instrumentation
+        if (self.profile and inst.profile_rate and random.random() < inst.profile_rate
+                and inst._profile_lock.acquire(blocking=False)):
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        inst = self.instrumentation
+        if self.profiler is not None:
+            self.profiler.disable()
+            inst._profile_lock.release()
+            inst._keep_profile(self.profiler, self.kind, elapsed)
+        inst.stage_histogram(self.kind).observe(elapsed)
+        total, rows, errors = _COUNTERS[self.kind]
+        inst.increment(total)
+        inst.increment(rows, self.rows)
+        if exc_type is not None:
+            inst.increment(errors)
+        return False
+
+
+class Instrumentation:
+    # Per-stage latency histograms and counters for the prediction path. Disabled
+    # by default; set GHG_METRICS=1 to record. With `profile_rate` > 0 that share
+    # of requests (or batches) runs under cProfile and the profiles at or above the
+    # p99 of the last five minutes are kept (the `max_profiles` slowest), for latency spikes.
+    # profile_text() renders them; with `profile_dir` set (GHG_PROFILE_DIR) each kept
+    # profile is also dumped there as a .prof file for pstats or snakeviz.
+    def __init__(self, enabled=False, profile_rate=0.0, max_profiles=10, buckets=LATENCY_BUCKETS,
+                 profile_dir=None):
+        self.enabled = enabled
+        self.profile_rate = profile_rate
+        self.max_profiles = max_profiles
+        self.profile_dir = profile_dir
+        self.buckets = buckets
+        self.stages = {'request': Histogram(buckets)}
+        self.counters = {}
+        self.profiles = []
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+
+    def stage_histogram(self, name):
+        histogram = self.stages.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(name, Histogram(self.buckets))
+        return histogram
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self.stage_histogram(name))
+
+    def request(self, rows=1, profile=True):
+        # Times one prediction request; wrap the stage() blocks in it. Pass
+        # profile=False where the request's work runs on another thread.
+        if not self.enabled:
+            return _NULL_TIMER
+        return _RequestTimer(self, rows, 'request', profile)
+
+    def batch(self, rows):
+        # Times one predict call on rows coalesced from several requests
+        if not self.enabled:
+            return _NULL_TIMER
+        return _RequestTimer(self, rows, 'batch')
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _keep_profile(self, profiler, kind, elapsed):
+        # The rolling p99, so the cut-off follows current traffic rather than all of uptime
+        threshold = self.stage_histogram(kind).quantile(0.99)
+        if threshold is not None and elapsed < threshold:
+            return
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(25)
+        profile = {'kind': kind, 'seconds': elapsed, 'at': time.time(), 'stats': out.getvalue()}
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            name = f"{kind}-{time.strftime('%Y%m%dT%H%M%S')}-{elapsed * 1000:.0f}ms-{os.getpid()}.prof"
+            profile['path'] = os.path.join(self.profile_dir, name)
+            profiler.dump_stats(profile['path'])
+        with self._lock:
+            self.profiles.append(profile)
+            self.profiles.sort(key=lambda profile: -profile['seconds'])
+            del self.profiles[self.max_profiles:]
+        self.increment('profiles_total')
+
+    def profile_text(self):
+        # The kept profiles, slowest first, as cProfile's cumulative-time listings
+        with self._lock:
+            profiles = list(self.profiles)
+        if not profiles:
+            return 'No profiles kept (profiling is off or nothing was slow enough yet)\n'
+        return '\n'.join(
+            f"=== {profile['kind']} took {profile['seconds'] * 1000:.2f} ms at "
+            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(profile['at']))} ===\n{profile['stats']}"
+            for profile in profiles
+        )
+
+    def snapshot(self):
+        return {
+            'enabled': self.enabled,
+            'stages_seconds': {name: histogram.snapshot() for name, histogram in self.stages.items()},
+            'counters': dict(self.counters),
+            'profiles': [{k: v for k, v in profile.items() if k != 'stats'} for profile in self.profiles],
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def prometheus(self, prefix='ghg'):
+        # Prometheus text exposition format (buckets are cumulative there)
+        lines = [f'# TYPE {prefix}_stage_seconds histogram']
+        for name, histogram in self.stages.items():
+            with histogram._lock:
+                counts, count, total = list(histogram.counts), histogram.count, histogram.sum
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {total}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {count}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            lines.append(f'{prefix}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self.stages = {'request': Histogram(self.buckets)}
+            self.counters = {}
+            self.profiles = []
+
+
+instrumentation = Instrumentation(enabled=os.environ.get('GHG_METRICS') == '1',
+                                  profile_rate=float(os.environ.get('GHG_PROFILE_RATE', 0)),
+                                  profile_dir=os.environ.get('GHG_PROFILE_DIR') or None)
@@ -0,0 +1,129 @@
+import argparse
+import hashlib
+import os
+import time
+
+POINTER = 'CURRENT'
+HOST_DIR = 'models/host'
+
+
+def current_path(host_dir=HOST_DIR):
+    # The published forest file that CURRENT names
+    with open(os.path.join(host_dir, POINTER)) as f:
+        name = f.read().strip()
+    if not name or os.sep in name:
+        raise ValueError(f'{os.path.join(host_dir, POINTER)} does not name a model file')
+    return os.path.join(host_dir, name)
+
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def publish(model, host_dir=HOST_DIR, precision='float64', keep=3):
+    # Write `model` (a fitted forest, or a path to a pickled one) as a compact forest
+    # file, then point CURRENT at it. Both steps are os.replace renames, so a worker
+    # sees either the old version or the new one, never a partial file. Workers pick
+    # the new version up on their next registry lookup, without restarting.
+    import joblib
+
+    from utils.forest import CompiledForest, save_compact
+
+    if isinstance(model, str):
+        model = joblib.load(model)
+    forest = model if isinstance(model, CompiledForest) else CompiledForest.from_estimator(model)
+    os.makedirs(host_dir, exist_ok=True)
+
+    tmp_path = os.path.join(host_dir, f'.publish-{os.getpid()}.tmp')
+    save_compact(forest, tmp_path, precision)
+    digest = hashlib.sha256()
+    with open(tmp_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    name = f"forest-{time.strftime('%Y%m%dT%H%M%S')}-{digest.hexdigest()[:12]}.ghgf"
+    os.replace(tmp_path, os.path.join(host_dir, name))
+    _write_atomic(os.path.join(host_dir, POINTER), name.encode())
+
+    # Older versions can be deleted while workers still map them: on POSIX the pages
+    # stay valid until the last mapping is gone
+    versions = sorted((entry for entry in os.scandir(host_dir) if entry.name.endswith('.ghgf')),
+                      key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+    for entry in versions[keep:]:
+        if entry.name != name:
+            os.remove(entry.path)
+    return os.path.join(host_dir, name)
+
+
+def _worker_memory(model_path, rows, results, release):
+    import numpy as np
+    import psutil
+
+    from utils.model_registry import get_model
+
+    model = get_model(model_path)
+    model.predict(np.asarray(rows))
+    info = psutil.Process().memory_full_info()
+    results.put({'rss': info.rss, 'uss': info.uss, 'pss': getattr(info, 'pss', None)})
+    # Stay alive until every worker has measured, so shared pages are counted as shared
+    release.get()
+
+
+def measure_workers(model_path, workers=4, rows=2000):
+    # Memory of `workers` processes that each load `model_path` and predict
+    import multiprocessing
+
+    import numpy as np
+
+    from utils.train import load_feature_matrix
+
+    X = np.asarray(load_feature_matrix()['X'][:rows]).tolist()
+    context = multiprocessing.get_context('spawn')
+    results, release = context.Queue(), context.Queue()
+    processes = [context.Process(target=_worker_memory, args=(model_path, X, results, release)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    stats = [results.get() for _ in processes]
+    for _ in processes:
+        release.put(None)
+    for process in processes:
+        process.join()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Publish forests for memory-mapped sharing across worker processes.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    pub = sub.add_parser('publish', help='compile a pickled forest and make it the current version')
+    pub.add_argument('--model', default='models/LR_model.pkl')
+    pub.add_argument('--host', default=HOST_DIR)
+    pub.add_argument('--precision', default='float64', choices=['float32', 'float64'],
+                     help='float64 keeps predictions identical to the pickled forest')
+    pub.add_argument('--keep', type=int, default=3, help='published versions to keep on disk')
+    status = sub.add_parser('status', help='show the current version')
+    status.add_argument('--host', default=HOST_DIR)
+    memory = sub.add_parser('memory', help='per-process memory of N workers loading a model path')
+    memory.add_argument('path', nargs='?', default=HOST_DIR, help='host directory, .ghgf or .pkl')
+    memory.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if args.command == 'publish':
+        path = publish(args.model, args.host, args.precision, args.keep)
+        print(f'Published {path} ({os.path.getsize(path) / 1e6:.1f} MB); '
+              f'point GHG_MODEL_PATH at {args.host} to serve it')
+    elif args.command == 'status':
+        path = current_path(args.host)
+        print(f'{path} ({os.path.getsize(path) / 1e6:.1f} MB, '
+              f"published {time.ctime(os.path.getmtime(path))})")
+    else:
+        for i, stats in enumerate(measure_workers(args.path, args.workers)):
+            pss = f"{stats['pss'] / 1e6:7.1f} MB" if stats['pss'] is not None else 'n/a'
+            print(f"worker {i}: RSS {stats['rss'] / 1e6:7.1f} MB  USS {stats['uss'] / 1e6:7.1f} MB  PSS {pss}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+import joblib
+import psutil
+
+# GHG_MODEL_PATH can point at a compact forest (.ghgf) exported by utils.forest, or
+# at a model host directory from utils.model_host, which is followed to its current version
+MODEL_PATH = os.environ.get('GHG_MODEL_PATH', 'models/LR_model.pkl')
+SCALER_PATH = os.environ.get('GHG_SCALER_PATH', 'models/scaler.pkl')
+
+
+def load_artifact(path):
+    if path.endswith('.ghgf'):
+        # Memory-mapped, so server processes on one host share a single copy
+        from utils.forest import load_compact
+        return load_compact(path)
+    return joblib.load(path)
+
+
+def resolve(path):
+    if os.path.isdir(path):
+        from utils.model_host import current_path
+        return os.path.abspath(current_path(path))
+    return path
+
+
+class ModelRegistry:
+    # One instance per process (see `registry` below). Streamlit re-runs the app
+    # script on every interaction but keeps imported modules, so artifacts loaded
+    # here are shared by all sessions and only reloaded when the file changes.
+    def __init__(self, loader=load_artifact):
+        self.loader = loader
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_version(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path):
+        key = os.path.abspath(path)
+        target = resolve(key)
+        # For a host directory the entry is swapped when CURRENT names a new file
+        version = self.file_version(target) + ((target,) if target != key else ())
+        entry = self._entries.get(key)
+        if entry is not None and entry['version'] == version:
+            return entry['artifact']
+
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            # Another session may have finished loading while we waited
+            entry = self._entries.get(key)
+            if entry is not None and entry['version'] == version:
+                return entry['artifact']
+            process = psutil.Process()
+            rss_before = process.memory_info().rss
+            start = time.perf_counter()
+            artifact = self.loader(target)
+            load_seconds = time.perf_counter() - start
+            self._entries[key] = {
+                'artifact': artifact,
+                'version': version,
+                'file_size': version[1],
+                'load_seconds': load_seconds,
+                'rss_delta': process.memory_info().rss - rss_before,
+                'loaded_at': time.time(),
+                'loads': (entry['loads'] if entry else 0) + 1,
+            }
+            return artifact
+
+    def version(self, path):
+        entry = self._entries.get(os.path.abspath(path))
+        return entry['version'] if entry else None
+
+    def stats(self):
+        return {path: {k: v for k, v in entry.items() if k != 'artifact'}
+                for path, entry in self._entries.items()}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+registry = ModelRegistry()
+
+
+def get_model(path=MODEL_PATH):
+    return registry.get(path)
+
+
+def get_scaler(path=SCALER_PATH):
+    return registry.get(path)
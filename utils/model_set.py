@@ -0,0 +1,197 @@
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import Histogram
+from utils.model_registry import MODEL_PATH, SCALER_PATH, get_model, get_scaler
+from utils.preprocessor import preprocess_input
+
+# Absolute difference from the primary model's prediction
+DISAGREEMENT_BUCKETS = (1e-6, 1e-5, 1e-4, 1e-3, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def parse_models(specs):
+    # ['name=path', ...] from the command line -> {name: path}
+    models = {}
+    for spec in specs:
+        name, sep, path = spec.partition('=')
+        if not sep or not name or not path:
+            raise ValueError(f'Expected name=path, got {spec!r}')
+        models[name] = path
+    return models
+
+
+class _ModelStats:
+    def __init__(self):
+        self.latency = Histogram()
+        self.disagreement = Histogram(DISAGREEMENT_BUCKETS)
+        self.rows = 0
+        self.abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+        self.errors = 0
+        self.skipped = 0
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, diff=None):
+        self.latency.observe(seconds)
+        if diff is None:
+            return
+        with self._lock:
+            self.rows += len(diff)
+            self.abs_diff_sum += float(diff.sum())
+            self.max_abs_diff = max(self.max_abs_diff, float(diff.max(initial=0.0)))
+        # One observation per batch: its mean |diff|
+        self.disagreement.observe(float(diff.mean()) if len(diff) else 0.0)
+
+    def try_start(self, max_pending):
+        # Reserve a slot for one more in-flight batch, or count the batch as skipped
+        with self._lock:
+            if self.pending >= max_pending:
+                self.skipped += 1
+                return False
+            self.pending += 1
+            return True
+
+    def finish(self, seconds=None, diff=None):
+        # seconds=None records a failed batch
+        with self._lock:
+            self.pending -= 1
+            if seconds is None:
+                self.errors += 1
+        if seconds is not None:
+            self.record(seconds, diff)
+
+    def snapshot(self):
+        return {
+            'latency_seconds': self.latency.snapshot(),
+            'rows': self.rows,
+            'mean_abs_diff': self.abs_diff_sum / self.rows if self.rows else None,
+            'max_abs_diff': self.max_abs_diff,
+            'batch_mean_abs_diff': self.disagreement.snapshot(),
+            'errors': self.errors,
+            'skipped': self.skipped,
+        }
+
+
+class ModelSet:
+    # Several models behind one scaler: each request is encoded and scaled once and
+    # the matrix is predicted by every model in parallel. Only the primary model's
+    # predictions are returned; the others (shadows) are timed and compared with it
+    # after the fact, so a slow shadow never delays a response. Each model has its own
+    # worker thread, and a shadow already `max_pending` batches behind skips new ones.
+    # Models are looked up in the registry on every call, so retrained files are picked up.
+    def __init__(self, models, primary=None, scaler_path=SCALER_PATH, max_pending=4):
+        if not models:
+            raise ValueError('ModelSet needs at least one model')
+        self.models = dict(models)
+        self.primary = primary or next(iter(self.models))
+        if self.primary not in self.models:
+            raise ValueError(f'Primary model {self.primary!r} is not one of {list(self.models)}')
+        self.scaler_path = scaler_path
+        self.max_pending = max_pending
+        self.transform_latency = Histogram()
+        self._stats = {name: _ModelStats() for name in self.models}
+        self._executors = {name: ThreadPoolExecutor(1) for name in self.models}
+
+    def transform(self, input_df):
+        # `input_df` is the raw feature frame; returns the scaled matrix
+        start = time.perf_counter()
+        X = get_scaler(self.scaler_path).transform(preprocess_input(input_df))
+        self.transform_latency.observe(time.perf_counter() - start)
+        return X
+
+    def _predict_one(self, name, X):
+        start = time.perf_counter()
+        predictions = get_model(self.models[name]).predict(X)
+        return predictions, time.perf_counter() - start
+
+    def _record_shadow(self, name, primary, future):
+        # Done callback, on the shadow's thread, possibly after the response went out
+        try:
+            predictions, seconds = future.result()
+        except Exception:
+            self._stats[name].finish()
+            return
+        # primary is None when the primary failed: only the latency is recorded
+        self._stats[name].finish(seconds, None if primary is None else np.abs(predictions - primary))
+
+    def predict_all(self, input_df, wait_for_shadows=True):
+        # {name: predictions}. A shadow that fails or is skipped is left out. With
+        # wait_for_shadows=False only the primary is waited for.
+        X = self.transform(input_df)
+        futures = {}
+        for name in self.models:
+            if name == self.primary or self._stats[name].try_start(self.max_pending):
+                futures[name] = self._executors[name].submit(self._predict_one, name, X)
+        primary = None
+        try:
+            primary, seconds = futures.pop(self.primary).result()
+            self._stats[self.primary].record(seconds)
+        finally:
+            # Attached even when the primary raises: the callback releases the
+            # shadow's pending slot
+            for name, future in futures.items():
+                future.add_done_callback(
+                    lambda future, name=name, primary=primary: self._record_shadow(name, primary, future))
+
+        results = {self.primary: primary}
+        if wait_for_shadows:
+            for name, future in futures.items():
+                if future.exception() is None:
+                    results[name] = future.result()[0]
+        return results
+
+    def predict(self, input_df):
+        return self.predict_all(input_df, wait_for_shadows=False)[self.primary]
+
+    def predict_records(self, records):
+        scaler = get_scaler(self.scaler_path)
+        return self.predict(pd.DataFrame.from_records(records, columns=scaler.feature_names_in_))
+
+    def stats(self):
+        return {
+            'primary': self.primary,
+            'transform_latency_seconds': self.transform_latency.snapshot(),
+            'models': {name: stats.snapshot() for name, stats in self._stats.items()},
+        }
+
+    def close(self, wait=False):
+        # wait=True lets in-flight shadows finish and be recorded first
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare models side by side on the workbook rows.')
+    parser.add_argument('models', nargs='*', default=[f'primary={MODEL_PATH}'],
+                        help='name=path, the first one is the primary')
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    parser.add_argument('--batch-size', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    from utils.data_loader import load_emission_data
+
+    model_set = ModelSet(parse_models(args.models), scaler_path=args.scaler)
+    scaler = get_scaler(args.scaler)
+    df = load_emission_data()[list(scaler.feature_names_in_)]
+    for start in range(0, len(df), args.batch_size):
+        model_set.predict_all(df.iloc[start:start + args.batch_size])
+    model_set.close(wait=True)
+
+    stats = model_set.stats()
+    print(f"Shared transform: mean {stats['transform_latency_seconds']['mean'] * 1000:.2f} ms per batch")
+    for name, model_stats in stats['models'].items():
+        latency = model_stats['latency_seconds']
+        line = f"{name:<16} predict mean {latency['mean'] * 1000:8.2f} ms"
+        if name != stats['primary']:
+            line += f"  mean |diff| {model_stats['mean_abs_diff']:.6f}  max |diff| {model_stats['max_abs_diff']:.6f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
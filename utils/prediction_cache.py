@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.feature_schema import feature_schema
+from utils.forest import compiled_forest
+from utils.metrics import instrumentation
+from utils.model_registry import MODEL_PATH, SCALER_PATH, get_model, get_scaler, registry
+
+
+class PredictionCache:
+    # LRU + TTL cache of predictions keyed on the encoded feature row, rounded to
+    # `decimals` so float noise from the form inputs maps to the same entry. Entries
+    # are tagged with the artifact version and dropped when the model changes. An
+    # entry is a scalar, or a vector when predict_fn returns one row per input row.
+    def __init__(self, maxsize=4096, ttl=3600.0, decimals=6):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.decimals = decimals
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def keys(self, input_df):
+        X = np.round(np.asarray(input_df, dtype=np.float64), self.decimals)
+        return [tuple(row) for row in X.tolist()]
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def predict(self, input_df, predict_fn, version=None):
+        # Rows already cached are served directly; each distinct missing row is
+        # predicted once, in one call, and copied to every row that shares its key
+        keys = self.keys(input_df)
+        now = time.monotonic()
+        # Allocated once the shape of an entry is known
+        predictions = None
+        missing = {}
+        with self._lock:
+            self._check_version(version)
+            for i, key in enumerate(keys):
+                if key in missing:
+                    missing[key].append(i)
+                    self.misses += 1
+                    continue
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[1] > self.ttl:
+                    del self._entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    missing[key] = [i]
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    if predictions is None:
+                        predictions = np.empty((len(keys),) + np.shape(entry[0]), dtype=np.float64)
+                    predictions[i] = entry[0]
+                    self.hits += 1
+
+        if missing:
+            first = [rows[0] for rows in missing.values()]
+            rows = input_df.iloc[first] if hasattr(input_df, 'iloc') else np.asarray(input_df)[first]
+            unique_predictions = np.asarray(predict_fn(rows), dtype=np.float64)
+            if predictions is None:
+                predictions = np.empty((len(keys),) + unique_predictions.shape[1:], dtype=np.float64)
+            for value, positions in zip(unique_predictions, missing.values()):
+                predictions[positions] = value
+            with self._lock:
+                if version == self._version:
+                    for key, value in zip(missing, unique_predictions):
+                        self._entries[key] = (value, now)
+                        self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+        if predictions is None:
+            return np.empty(0, dtype=np.float64)
+        return predictions
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+
+prediction_cache = PredictionCache()
+# Forest intervals: one entry per row holds the mean, std and quantiles together
+interval_cache = PredictionCache()
+
+
+def predict_cached(input_df, model_path=MODEL_PATH, scaler_path=SCALER_PATH, cache=prediction_cache):
+    # `input_df` is the output of preprocess_input
+    model = get_model(model_path)
+    scaler = get_scaler(scaler_path)
+    version = (registry.version(model_path), registry.version(scaler_path))
+
+    def predict(rows):
+        with instrumentation.stage('scaler_transform'):
+            X = scaler.transform(rows)
+        with instrumentation.stage('model_predict'):
+            return model.predict(X)
+
+    return cache.predict(input_df, predict, version)
+
+
+def predict_row_cached(values, model_path=MODEL_PATH, scaler_path=SCALER_PATH, cache=prediction_cache):
+    # Single-row fast path for a form dict, with no DataFrame. The schema encodes to
+    # the same values as preprocess_input, so it shares cache entries with predict_cached.
+    model = get_model(model_path)
+    # Same predictions as the sklearn forest, without its per-call joblib overhead
+    model = compiled_forest(model) or model
+    schema = feature_schema(get_scaler(scaler_path))
+    version = (registry.version(model_path), registry.version(scaler_path))
+
+    def predict(rows):
+        with instrumentation.stage('scaler_transform'):
+            X = schema.scale(rows)
+        with instrumentation.stage('model_predict'):
+            return model.predict(X)
+
+    with instrumentation.stage('encode'):
+        row = schema.encode(values)
+    return cache.predict(row, predict, version)
+
+
+def predict_interval_cached(values, quantiles=(0.05, 0.95), model_path=MODEL_PATH, scaler_path=SCALER_PATH,
+                            cache=interval_cache):
+    # The forest's prediction and its trees' spread for a form dict, from one cached
+    # entry; None for models without trees. 'mean' is bit-identical to predict().
+    forest = compiled_forest(get_model(model_path))
+    if forest is None:
+        return None
+    quantiles = tuple(quantiles)
+    schema = feature_schema(get_scaler(scaler_path))
+    version = (registry.version(model_path), registry.version(scaler_path), quantiles)
+
+    def predict(rows):
+        with instrumentation.stage('scaler_transform'):
+            X = schema.scale(rows)
+        with instrumentation.stage('interval'):
+            interval = forest.predict_interval(X, quantiles)
+        return np.column_stack([interval['mean'], interval['std']] + [interval['quantiles'][q] for q in quantiles])
+
+    with instrumentation.stage('encode'):
+        row = schema.encode(values)
+    columns = cache.predict(row, predict, version)
+    return {
+        'mean': columns[:, 0],
+        'std': columns[:, 1],
+        'quantiles': {q: columns[:, 2 + i] for i, q in enumerate(quantiles)},
+    }
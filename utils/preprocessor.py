@@ -1,12 +1,101 @@
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 
-def preprocess_input(df):
-    substance_map = {'carbon dioxide': 0, 'methane': 1, 'nitrous oxide': 2, 'other GHGs': 3}
-    unit_map = {'kg/2018 USD, purchaser price': 0, 'kg CO2e/2018 USD, purchaser price': 1}
-    source_map = {'Commodity': 0, 'Industry': 1}
+SUBSTANCE_MAP = {'carbon dioxide': 0, 'methane': 1, 'nitrous oxide': 2, 'other GHGs': 3}
+UNIT_MAP = {'kg/2018 USD, purchaser price': 0, 'kg CO2e/2018 USD, purchaser price': 1}
+SOURCE_MAP = {'Commodity': 0, 'Industry': 1}
+
+CATEGORY_MAPS = {
+    'Substance': SUBSTANCE_MAP,
+    'Unit': UNIT_MAP,
+    'Source': SOURCE_MAP,
+}
+
+# Model inputs in the order the scaler and the apps use
+FEATURE_COLUMNS = [
+    'Substance',
+    'Unit',
+    'Supply Chain Emission Factors without Margins',
+    'Margins of Supply Chain Emission Factors',
+    'DQ ReliabilityScore of Factors without Margins',
+    'DQ TemporalCorrelation of Factors without Margins',
+    'DQ GeographicalCorrelation of Factors without Margins',
+    'DQ TechnologicalCorrelation of Factors without Margins',
+    'DQ DataCollection of Factors without Margins',
+    'Source',
+]
+
+
+class CategoricalEncoder:
+    # Lookups are compiled once. Categorical and Arrow-backed columns are encoded
+    # through their dictionaries, so only the handful of distinct labels are hashed.
+    def __init__(self, category_maps=CATEGORY_MAPS):
+        self.category_maps = {column: dict(mapping) for column, mapping in category_maps.items()}
+        self._labels = {column: pd.Index(list(mapping)) for column, mapping in self.category_maps.items()}
+        self._arrow_labels = {column: pa.array(list(mapping)) for column, mapping in self.category_maps.items()}
+        self._codes = {column: np.array(list(mapping.values()), dtype=np.int64)
+                       for column, mapping in self.category_maps.items()}
+        # Maps numbered 0..n-1 in insertion order need no final remapping pass
+        self._identity = {column: np.array_equal(codes, np.arange(len(codes)))
+                          for column, codes in self._codes.items()}
+
+    def encode_column(self, column, values):
+        if isinstance(values, pd.Series):
+            values = values.array
+        if isinstance(values, pd.Categorical):
+            # Remap the codes through a lookup array with one entry per category.
+            # Unknown categories and the missing code (-1, the last entry) map to -1,
+            # so unused unknown categories are fine and only labels actually present raise.
+            table = self._lookup(column, values.categories)
+            positions = values.codes
+            if np.array_equal(table, np.arange(len(table))) and positions.min(initial=0) >= 0:
+                # Categories already in code order: the codes are the encoding
+                return positions
+            dtype = np.result_type(positions.dtype, np.min_scalar_type(-int(table.max(initial=0)) - 1))
+            encoded = np.append(table, -1).astype(dtype).take(positions)
+            if encoded.min(initial=0) < 0:
+                self._raise_unknown(column, values)
+            return encoded
+
+        if isinstance(values, pd.arrays.ArrowStringArray):
+            indices = pc.index_in(values._pa_array, value_set=self._arrow_labels[column])
+            if indices.null_count:
+                self._raise_unknown(column, values)
+            positions = indices.to_numpy().astype(np.int64, copy=False)
+        else:
+            if isinstance(values, pd.arrays.NumpyExtensionArray):
+                values = np.asarray(values)
+            positions = self._labels[column].get_indexer(values)
+            if (positions < 0).any():
+                self._raise_unknown(column, values)
+        if self._identity[column]:
+            return positions
+        return self._codes[column].take(positions)
 
-    df['Substance'] = df['Substance'].map(substance_map)
-    df['Unit'] = df['Unit'].map(unit_map)
-    df['Source'] = df['Source'].map(source_map)
-    return df
+    def _lookup(self, column, labels):
+        positions = self._labels[column].get_indexer(labels)
+        return np.where(positions < 0, -1, self._codes[column].take(positions))
 
+    def _raise_unknown(self, column, values):
+        labels = self._labels[column]
+        present = pd.unique(np.asarray(values, dtype=object))
+        unknown = [label for label in present if pd.isna(label) or label not in labels]
+        raise ValueError(f'Unknown {column} labels: {unknown!r}; expected one of {list(labels)}')
+
+    def transform(self, df):
+        # Shallow copy: the caller's frame and its other columns are left untouched
+        out = df.copy(deep=False)
+        for column in self.category_maps:
+            out[column] = self.encode_column(column, df[column])
+        return out
+
+    __call__ = transform
+
+
+encoder = CategoricalEncoder()
+
+
+def preprocess_input(df):
+    return encoder.transform(df)
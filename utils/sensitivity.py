@@ -0,0 +1,134 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import qmc
+
+from utils.model_registry import MODEL_PATH, SCALER_PATH, get_model, get_scaler
+from utils.preprocessor import preprocess_input
+
+DQ_COLUMNS = [
+    'DQ ReliabilityScore of Factors without Margins',
+    'DQ TemporalCorrelation of Factors without Margins',
+    'DQ GeographicalCorrelation of Factors without Margins',
+    'DQ TechnologicalCorrelation of Factors without Margins',
+    'DQ DataCollection of Factors without Margins',
+]
+MARGIN_COLUMNS = [
+    'Supply Chain Emission Factors without Margins',
+    'Margins of Supply Chain Emission Factors',
+]
+SWEEP_COLUMNS = DQ_COLUMNS + MARGIN_COLUMNS
+PREDICTION_COLUMN = 'Predicted Emission Factor'
+
+
+def default_ranges(base, columns, spread=0.5):
+    # DQ metrics over the form's 0-1 slider range, the two factors +/- `spread` around
+    # the current value (0-1 when the value is 0)
+    ranges = {}
+    for column in columns:
+        if column in DQ_COLUMNS:
+            ranges[column] = (0.0, 1.0)
+        else:
+            value = float(base[column])
+            ranges[column] = (value * (1 - spread), value * (1 + spread)) if value > 0 else (0.0, 1.0)
+    return ranges
+
+
+def sample(ranges, n=10_000, method='grid', seed=0):
+    # (points x dims) array: a full grid with about n points, or n Latin hypercube points
+    lows, highs = np.array(list(ranges.values()), dtype=np.float64).T
+    if method == 'grid':
+        per_dim = max(2, int(round(n ** (1 / len(ranges)))))
+        axes = [np.linspace(low, high, per_dim) for low, high in zip(lows, highs)]
+        return np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(ranges))
+    if method == 'lhs':
+        return qmc.scale(qmc.LatinHypercube(d=len(ranges), seed=seed).random(n), lows, highs)
+    raise ValueError(f'Unknown sampling method {method!r}, expected grid or lhs')
+
+
+def sweep(base, columns, n=10_000, method='grid', ranges=None, seed=0,
+          model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    # Score every variant of `base` (a form-style dict) in one predict call. The base
+    # row is encoded once and copied; only the swept columns change per variant.
+    scaler = get_scaler(scaler_path)
+    names = list(scaler.feature_names_in_)
+    ranges = ranges or default_ranges(base, columns)
+    points = sample({column: ranges[column] for column in columns}, n, method, seed)
+
+    encoded = preprocess_input(pd.DataFrame([base], columns=names)).to_numpy(np.float64)
+    X = np.repeat(encoded, len(points), axis=0)
+    X[:, [names.index(column) for column in columns]] = points
+    # StandardScaler.transform on the bare array, without a per-variant DataFrame
+    X -= scaler.mean_
+    X /= scaler.scale_
+
+    result = pd.DataFrame(points, columns=columns)
+    result[PREDICTION_COLUMN] = get_model(model_path).predict(X)
+    return result
+
+
+def _bin(values, low, high, bins):
+    if high <= low:
+        return np.zeros(len(values), dtype=np.intp), np.array([low])
+    index = np.clip(((values - low) / (high - low) * bins).astype(np.intp), 0, bins - 1)
+    return index, low + (np.arange(bins) + 0.5) * (high - low) / bins
+
+
+def partial_dependence(result, column, bins=20):
+    # Mean prediction per bin of `column`, averaged over the other swept inputs
+    values = result[column].to_numpy()
+    index, centers = _bin(values, values.min(), values.max(), bins)
+    counts = np.bincount(index, minlength=len(centers))
+    sums = np.bincount(index, result[PREDICTION_COLUMN].to_numpy(), minlength=len(centers))
+    keep = counts > 0
+    return pd.DataFrame({column: centers[keep], PREDICTION_COLUMN: sums[keep] / counts[keep]})
+
+
+def heatmap(result, x, y, bins=20):
+    # Long-format (x, y, mean prediction) over a bins x bins grid of two swept inputs
+    xi, x_centers = _bin(result[x].to_numpy(), result[x].min(), result[x].max(), bins)
+    yi, y_centers = _bin(result[y].to_numpy(), result[y].min(), result[y].max(), bins)
+    cell = xi * len(y_centers) + yi
+    size = len(x_centers) * len(y_centers)
+    counts = np.bincount(cell, minlength=size)
+    sums = np.bincount(cell, result[PREDICTION_COLUMN].to_numpy(), minlength=size)
+    keep = counts > 0
+    grid_x, grid_y = np.meshgrid(x_centers, y_centers, indexing='ij')
+    return pd.DataFrame({x: grid_x.ravel()[keep], y: grid_y.ravel()[keep],
+                         PREDICTION_COLUMN: sums[keep] / counts[keep]})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sweep the DQ metrics and margins around one input row.')
+    parser.add_argument('--substance', default='carbon dioxide')
+    parser.add_argument('--unit', default='kg/2018 USD, purchaser price')
+    parser.add_argument('--source', default='Commodity')
+    parser.add_argument('--without-margins', type=float, default=0.5)
+    parser.add_argument('--margins', type=float, default=0.05)
+    parser.add_argument('--dq', type=float, nargs=5, default=[0.5] * 5)
+    parser.add_argument('--columns', nargs='*', default=DQ_COLUMNS)
+    parser.add_argument('-n', type=int, default=10_000)
+    parser.add_argument('--method', default='grid', choices=['grid', 'lhs'])
+    args = parser.parse_args(argv)
+
+    base = {
+        'Substance': args.substance,
+        'Unit': args.unit,
+        MARGIN_COLUMNS[0]: args.without_margins,
+        MARGIN_COLUMNS[1]: args.margins,
+        **dict(zip(DQ_COLUMNS, args.dq)),
+        'Source': args.source,
+    }
+    get_model()
+    start = time.perf_counter()
+    result = sweep(base, args.columns, args.n, args.method)
+    print(f'Scored {len(result)} variants in {time.perf_counter() - start:.3f}s')
+    for column in args.columns:
+        curve = partial_dependence(result, column, bins=5)[PREDICTION_COLUMN]
+        print(f"  {column:<55} {' '.join(f'{value:.4f}' for value in curve)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import tornado.web
+
+from utils.metrics import SIZE_BUCKETS, Histogram, instrumentation
+from utils.model_registry import MODEL_PATH, SCALER_PATH, get_model, get_scaler
+from utils.model_set import ModelSet, parse_models
+from utils.prediction_cache import prediction_cache, predict_cached
+from utils.preprocessor import CATEGORY_MAPS, preprocess_input
+
+
+def predict_records(records, model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    # One vectorised encode -> scale -> predict pass over the coalesced rows that
+    # are not already in the prediction cache
+    scaler = get_scaler(scaler_path)
+    with instrumentation.batch(len(records)):
+        with instrumentation.stage('dataframe'):
+            df = pd.DataFrame.from_records(records, columns=scaler.feature_names_in_)
+        with instrumentation.stage('preprocess_input'):
+            input_df = preprocess_input(df)
+        return predict_cached(input_df, model_path, scaler_path)
+
+
+def _is_finite_number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return math.isfinite(value)
+    except OverflowError:  # an int too large for a float
+        return False
+
+
+def validate_rows(rows, feature_names):
+    # Reject bad rows per request, before they are coalesced with other requests:
+    # every feature must be present, categories a known label and numbers finite
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            raise ValueError(f'row {i}: expected a JSON object')
+        missing = [name for name in feature_names if name not in row]
+        if missing:
+            raise ValueError(f'row {i}: missing fields {missing}')
+        for name in feature_names:
+            value = row[name]
+            mapping = CATEGORY_MAPS.get(name)
+            if mapping is not None:
+                if not isinstance(value, str) or value not in mapping:
+                    raise ValueError(f'row {i}: unknown {name} {value!r}; expected one of {list(mapping)}')
+            elif not _is_finite_number(value):
+                raise ValueError(f'row {i}: {name} must be a finite number, got {value!r}')
+
+
+def _settle(future, result=None, error=None):
+    # The client may have gone away and cancelled its future
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class MicroBatcher:
+    # Requests that arrive within `max_wait_ms` of the first queued one are
+    # coalesced, up to `max_batch_size` rows, into a single predict call. One batch
+    # runs at a time in a worker thread; the next one fills up meanwhile.
+    def __init__(self, predict_fn, max_batch_size=256, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.request_latency = Histogram()
+        self.batch_latency = Histogram()
+        self.batch_size = Histogram(SIZE_BUCKETS)
+        self._queue = asyncio.Queue()
+        self._slot = asyncio.Semaphore(1)
+        self._executor = ThreadPoolExecutor(1)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def predict(self, rows):
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, future))
+        try:
+            return await future
+        finally:
+            self.request_latency.observe(time.perf_counter() - start)
+
+    def _drain(self, batch, size):
+        while size < self.max_batch_size and not self._queue.empty():
+            item = self._queue.get_nowait()
+            batch.append(item)
+            size += len(item[0])
+        return size
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                size = self._drain(batch, size)
+                remaining = deadline - loop.time()
+                if size >= self.max_batch_size or remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            await self._slot.acquire()
+            # Pick up whatever queued while the previous batch was running
+            self._drain(batch, size)
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        try:
+            rows = [row for rows, _ in batch for row in rows]
+            self.batch_size.observe(len(rows))
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            try:
+                predictions = await loop.run_in_executor(self._executor, self.predict_fn, rows)
+            except Exception as e:
+                if len(batch) == 1:
+                    _settle(batch[0][1], error=e)
+                    return
+                # Retry each request on its own, so only the one that fails gets the error
+                for rows, future in batch:
+                    try:
+                        result = await loop.run_in_executor(self._executor, self.predict_fn, rows)
+                    except Exception as e:
+                        _settle(future, error=e)
+                    else:
+                        _settle(future, result.tolist())
+                return
+            self.batch_latency.observe(time.perf_counter() - start)
+            offset = 0
+            for rows, future in batch:
+                _settle(future, predictions[offset:offset + len(rows)].tolist())
+                offset += len(rows)
+        finally:
+            self._slot.release()
+
+    def stats(self):
+        return {
+            'request_latency_seconds': self.request_latency.snapshot(),
+            'batch_latency_seconds': self.batch_latency.snapshot(),
+            'batch_size_rows': self.batch_size.snapshot(),
+        }
+
+
+class PredictHandler(tornado.web.RequestHandler):
+    def initialize(self, batcher, feature_names):
+        self.batcher = batcher
+        self.feature_names = feature_names
+
+    async def post(self):
+        # Accepts one row object, a list of rows, or {"rows": [...]}
+        try:
+            payload = json.loads(self.request.body)
+            single = isinstance(payload, dict) and 'rows' not in payload
+            rows = [payload] if single else payload['rows'] if isinstance(payload, dict) else payload
+            if not isinstance(rows, list) or not rows:
+                raise ValueError('expected a row object or a non-empty list of rows')
+            validate_rows(rows, self.feature_names)
+        except ValueError as e:
+            self.set_status(400)
+            self.write({'error': str(e)})
+            return
+
+        # Per-request latency, queueing included; the batch itself is profiled in the worker
+        with instrumentation.request(len(rows), profile=False):
+            predictions = await self.batcher.predict(rows)
+        self.write({'prediction': predictions[0]} if single else {'predictions': predictions})
+
+
+class StatsHandler(tornado.web.RequestHandler):
+    def initialize(self, batcher, model_set=None):
+        self.batcher = batcher
+        self.model_set = model_set
+
+    def get(self):
+        stats = {**self.batcher.stats(), 'prediction_cache': prediction_cache.stats(),
+                 'instrumentation': instrumentation.snapshot()}
+        if self.model_set is not None:
+            stats['model_set'] = self.model_set.stats()
+        self.write(stats)
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; version=0.0.4')
+        self.write(instrumentation.prometheus())
+
+
+class ProfilesHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header('Content-Type', 'text/plain; charset=utf-8')
+        self.write(instrumentation.profile_text())
+
+
+def make_app(batcher, feature_names, model_set=None):
+    return tornado.web.Application([
+        (r'/predict', PredictHandler, {'batcher': batcher, 'feature_names': list(feature_names)}),
+        (r'/stats', StatsHandler, {'batcher': batcher, 'model_set': model_set}),
+        (r'/metrics', MetricsHandler),
+        (r'/profiles', ProfilesHandler),
+    ])
+
+
+async def serve(port=8000, max_batch_size=256, max_wait_ms=5.0,
+                model_path=MODEL_PATH, scaler_path=SCALER_PATH, shadows=None):
+    # Load once up front so the first request does not pay for unpickling
+    feature_names = get_scaler(scaler_path).feature_names_in_
+    get_model(model_path)
+
+    model_set = None
+    if shadows:
+        # Shadow models see the same scaled batches; responses come from the primary
+        model_set = ModelSet({'primary': model_path, **shadows}, 'primary', scaler_path)
+        for path in shadows.values():
+            get_model(path)
+        predict_fn = model_set.predict_records
+    else:
+        predict_fn = lambda rows: predict_records(rows, model_path, scaler_path)  # noqa: E731
+    batcher = MicroBatcher(predict_fn, max_batch_size, max_wait_ms)
+    batcher.start()
+    app = make_app(batcher, feature_names, model_set)
+    app.listen(port)
+    print(f'Serving GHG emission predictions on http://localhost:{port}/predict')
+    await asyncio.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='HTTP inference server for the GHG emission model.')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    parser.add_argument('--shadow', nargs='*', default=[], metavar='NAME=PATH',
+                        help='extra models to run on every batch and compare with --model (see /stats)')
+    parser.add_argument('--metrics', action='store_true', help='record per-stage latencies (same as GHG_METRICS=1)')
+    parser.add_argument('--profile-rate', type=float, default=instrumentation.profile_rate,
+                        help='share of batches to run under cProfile; the slowest are shown at /profiles')
+    parser.add_argument('--profile-dir', default=instrumentation.profile_dir,
+                        help='also write each kept profile to this directory as a .prof file')
+    args = parser.parse_args(argv)
+    instrumentation.enabled = instrumentation.enabled or args.metrics
+    instrumentation.profile_rate = args.profile_rate
+    instrumentation.profile_dir = args.profile_dir
+    asyncio.run(serve(args.port, args.max_batch_size, args.max_wait_ms, args.model, args.scaler,
+                      parse_models(args.shadow)))
+
+
+if __name__ == '__main__':
+    main()
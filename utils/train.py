@@ -0,0 +1,190 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import time
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from utils.data_loader import CACHE_DIR, EXCEL_FILE, file_hash, load_emission_data
+from utils.model_registry import MODEL_PATH, SCALER_PATH
+from utils.preprocessor import FEATURE_COLUMNS, preprocess_input
+
+TARGET = 'Supply Chain Emission Factors with Margins'
+# Bump when the feature construction below changes, to invalidate cached matrices
+FEATURE_VERSION = 1
+
+# The notebook's untuned comparison models, saved with --baselines for shadow serving
+BASELINES = {
+    'rf_default': ('models/rf_default.pkl', lambda: RandomForestRegressor(random_state=42)),
+    'linear': ('models/linear_model.pkl', LinearRegression),
+}
+
+# Same search space as the notebook's GridSearchCV; n_estimators is the resource
+PARAM_GRID = {
+    'max_depth': [None, 10, 20],
+    'min_samples_split': [2, 5],
+}
+
+
+def build_features(df):
+    # Notebook feature pipeline: encode, keep the model inputs, split off the target
+    X = preprocess_input(df[FEATURE_COLUMNS])
+    y = df[TARGET].to_numpy()
+    return X, y
+
+
+def load_feature_matrix(excel_file=EXCEL_FILE, cache_dir=CACHE_DIR, rebuild=False):
+    # Encoded + scaled matrix and fitted scaler, cached per workbook content
+    path = os.path.join(cache_dir, f'features-v{FEATURE_VERSION}-{file_hash(excel_file)[:16]}.joblib')
+    if not rebuild and os.path.exists(path):
+        return joblib.load(path, mmap_mode='r')
+
+    X, y = build_features(load_emission_data(excel_file, cache_dir))
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    cached = {'X': X_scaled, 'y': y, 'scaler': scaler}
+    os.makedirs(cache_dir, exist_ok=True)
+    joblib.dump(cached, path)
+    return cached
+
+
+def successive_halving(X, y, param_grid=PARAM_GRID, min_trees=25, max_trees=200, factor=2,
+                       cv=3, random_state=42, n_jobs=-1):
+    # Every candidate starts with `min_trees` trees per CV fold. After each round the
+    # best 1/factor survive and their forests are warm-started to `factor` times as
+    # many trees, so trees already grown are reused instead of refitting from scratch.
+    folds = list(KFold(cv, shuffle=True, random_state=random_state).split(X))
+    base = RandomForestRegressor(random_state=random_state, warm_start=True, n_jobs=n_jobs)
+    names = list(param_grid)
+    candidates = [
+        {
+            'params': dict(zip(names, values)),
+            'models': [clone(base).set_params(**dict(zip(names, values))) for _ in folds],
+            'fit_seconds': 0.0,
+            'rounds': [],
+        }
+        for values in itertools.product(*param_grid.values())
+    ]
+
+    alive = candidates
+    n_trees = min_trees
+    while True:
+        for candidate in alive:
+            scores = []
+            start = time.perf_counter()
+            for model, (train_idx, val_idx) in zip(candidate['models'], folds):
+                model.set_params(n_estimators=n_trees)
+                model.fit(X[train_idx], y[train_idx])
+                scores.append(r2_score(y[val_idx], model.predict(X[val_idx])))
+            elapsed = time.perf_counter() - start
+            candidate['fit_seconds'] += elapsed
+            candidate['rounds'].append({'n_estimators': n_trees, 'score': float(np.mean(scores)),
+                                        'seconds': elapsed})
+            print(f"  {candidate['params']} trees={n_trees:<4} r2={np.mean(scores):.5f} ({elapsed:.2f}s)")
+
+        alive.sort(key=lambda candidate: -candidate['rounds'][-1]['score'])
+        if len(alive) == 1 or n_trees >= max_trees:
+            break
+        for candidate in alive[math.ceil(len(alive) / factor):]:
+            candidate['models'] = None  # free the eliminated forests
+        alive = alive[:math.ceil(len(alive) / factor)]
+        if len(alive) == 1:
+            # Nothing left to compare: the winner is refit with max_trees by the caller,
+            # so scoring it again on every fold would only cost time
+            break
+        n_trees = min(n_trees * factor, max_trees)
+
+    best = alive[0]
+    results = [{k: v for k, v in candidate.items() if k != 'models'} for candidate in candidates]
+    return {**best['params'], 'n_estimators': max_trees}, results
+
+
+def train_baselines(X_train, y_train, X_test, y_test, baselines=BASELINES):
+    results = {}
+    for name, (path, make_model) in baselines.items():
+        start = time.perf_counter()
+        model = make_model().fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        y_pred = model.predict(X_test)
+        results[name] = {'path': path, 'fit_seconds': fit_seconds,
+                         'test_rmse': float(np.sqrt(mean_squared_error(y_test, y_pred))),
+                         'test_r2': r2_score(y_test, y_pred)}
+        joblib.dump(model, path)
+        print(f"Saved {name} to {path} (RMSE {results[name]['test_rmse']:.6f}, R² {results[name]['test_r2']:.5f})")
+    return results
+
+
+def train(excel_file=EXCEL_FILE, model_path=MODEL_PATH, scaler_path=SCALER_PATH, search=True,
+          min_trees=25, max_trees=200, factor=2, cv=3, report_path=None, baselines=False):
+    features = load_feature_matrix(excel_file)
+    X, y, scaler = np.asarray(features['X']), np.asarray(features['y']), features['scaler']
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    start = time.perf_counter()
+    if search:
+        print(f'Successive halving over {PARAM_GRID}, {min_trees}->{max_trees} trees, factor {factor}')
+        best_params, results = successive_halving(X_train, y_train, PARAM_GRID, min_trees, max_trees, factor, cv)
+    else:
+        best_params, results = {'n_estimators': max_trees}, []
+    search_seconds = time.perf_counter() - start
+    print(f'Best parameters: {best_params} (search took {search_seconds:.1f}s)')
+
+    start = time.perf_counter()
+    best_model = RandomForestRegressor(random_state=42, **best_params).fit(X_train, y_train)
+    refit_seconds = time.perf_counter() - start
+
+    y_pred = best_model.predict(X_test)
+    mse = mean_squared_error(y_test, y_pred)
+    print(f'RMSE: {np.sqrt(mse)}')
+    print(f'R² Score: {r2_score(y_test, y_pred)}')
+
+    joblib.dump(best_model, model_path)
+    joblib.dump(scaler, scaler_path)
+    print(f'Saved {model_path} and {scaler_path}')
+
+    report = {
+        'best_params': best_params,
+        'search_seconds': search_seconds,
+        'refit_seconds': refit_seconds,
+        'test_mse': mse,
+        'test_rmse': float(np.sqrt(mse)),
+        'test_r2': r2_score(y_test, y_pred),
+        'candidates': results,
+        'baselines': train_baselines(X_train, y_train, X_test, y_test) if baselines else {},
+    }
+    if report_path:
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    return best_model, scaler, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the GHG emission model and save the app artifacts.')
+    parser.add_argument('--excel-file', default=EXCEL_FILE)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--scaler', default=SCALER_PATH)
+    parser.add_argument('--no-search', action='store_true', help='skip tuning, fit a default forest with --max-trees')
+    parser.add_argument('--min-trees', type=int, default=25)
+    parser.add_argument('--max-trees', type=int, default=200)
+    parser.add_argument('--factor', type=int, default=2)
+    parser.add_argument('--cv', type=int, default=3)
+    parser.add_argument('--report', help='write per-candidate fit times and scores to this JSON file')
+    parser.add_argument('--baselines', action='store_true',
+                        help=f"also fit and save the notebook's comparison models ({', '.join(BASELINES)})")
+    args = parser.parse_args(argv)
+
+    train(args.excel_file, args.model, args.scaler, not args.no_search,
+          args.min_trees, args.max_trees, args.factor, args.cv, args.report, args.baselines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import threading
+
+# Deliberately free of heavy imports: the Streamlit apps import this before the
+# page is rendered, and numpy/pandas/sklearn are pulled in by the loader thread.
+_lock = threading.Lock()
+_ready = threading.Event()
+_cube_ready = threading.Event()
+_thread = None
+_error = None
+_cube_error = None
+_timings = {}
+
+
+def _load(model_path, scaler_path):
+    global _error
+    import time
+
+    try:
+        start = time.perf_counter()
+        import pandas  # noqa: F401
+        from utils.model_registry import MODEL_PATH, SCALER_PATH, get_model, get_scaler
+        from utils.prediction_cache import predict_row_cached  # noqa: F401
+        from utils.preprocessor import preprocess_input  # noqa: F401
+        _timings['imports'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        get_scaler(scaler_path or SCALER_PATH)
+        model = get_model(model_path or MODEL_PATH)
+        _timings['model_load'] = time.perf_counter() - start
+
+        # Flattened trees for the prediction interval shown next to the estimate
+        start = time.perf_counter()
+        from utils.forest import compiled_forest
+        compiled_forest(model)
+        _timings['compile_forest'] = time.perf_counter() - start
+
+        # Checks the scaler's column order once, rather than on every submit
+        from utils.feature_schema import feature_schema
+        feature_schema(get_scaler(scaler_path or SCALER_PATH))
+    except Exception as e:
+        _error = e
+    finally:
+        _ready.set()
+    _load_cube()
+
+
+def _load_cube():
+    # After the model, so Predict is never held up by the analytics data. On a fresh
+    # deploy this parses the whole workbook, which must not happen on a script thread.
+    global _cube_error
+    import time
+
+    try:
+        start = time.perf_counter()
+        from utils.cube import get_cube
+        get_cube()
+        _timings['cube_load'] = time.perf_counter() - start
+    except Exception as e:
+        _cube_error = e
+    finally:
+        _cube_ready.set()
+
+
+def start(model_path=None, scaler_path=None, retry=False):
+    # Idempotent: Streamlit reruns call this every time, only the first one loads.
+    # A failed load is only attempted again when `retry` is set.
+    global _thread, _error, _cube_error
+    with _lock:
+        failed = _error is not None or _cube_error is not None
+        if _thread is None or (retry and _cube_ready.is_set() and failed):
+            _ready.clear()
+            _cube_ready.clear()
+            _error = None
+            _cube_error = None
+            _thread = threading.Thread(target=_load, args=(model_path, scaler_path),
+                                       name='model-warmup', daemon=True)
+            _thread.start()
+
+
+def is_ready():
+    return _ready.is_set() and _error is None
+
+
+def error():
+    return _error
+
+
+def cube_is_ready():
+    return _cube_ready.is_set() and _cube_error is None
+
+
+def cube_error():
+    return _cube_error
+
+
+def wait(timeout=None):
+    return _ready.wait(timeout)
+
+
+def timings():
+    return dict(_timings)